@@ -1,17 +1,88 @@
 # backend/main.py
 import os
+import time
 import shutil
 import asyncio
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from uuid import uuid4
-import json
-from queue import Queue
 import threading
+import logging
+from utils.scheduler import PRIORITY_WEIGHTS, default_priority
+from utils.output_options import OUTPUT_TIERS, DEFAULT_OUTPUT_TIER, GROUP_BY_OPTIONS
+from utils.job_store import create_job_store, TERMINAL_STATUSES
+from utils.task_queue import create_task_queue
+from utils.ocr_store import create_ocr_store
+from utils.warmup import warm_up
+from utils.uploads import ZipStreamExtractor, UploadError, unique_upload_path
+from utils.pages import expand_upload, page_label
+from utils.downloads import RangeFileResponse
+from utils.retention import start_retention_sweeper, retention_report as retention_totals
 
-app = FastAPI(title="ARCFLOW Receipt Sorter API")
+logger = logging.getLogger(__name__)
+
+# Filled in by the warm-up; /ready reports 503 until "ready" is True
+readiness = {"ready": False, "report": None, "error": None}
+
+def run_warm_up():
+    """
+    With embedded workers: import the OCR pipeline, check Tesseract and
+    prime it, then start them. Without, the API never runs OCR and is
+    ready at once; /ready then only checks the stores.
+    """
+    if EMBEDDED_WORKERS <= 0:
+        logger.info("No embedded OCR workers; run `python worker.py` to process jobs")
+        readiness["ready"] = True
+        return
+
+    try:
+        readiness["report"] = warm_up()
+    except Exception as e:
+        logger.error(f"❌ Warm-up failed: {e}")
+        readiness["error"] = str(e)
+        return
+    
+    from utils.ocr_worker import start_worker_threads
+    start_worker_threads(task_queue, job_store, EMBEDDED_WORKERS, ocr_store=ocr_store)
+    logger.info(f"Started {EMBEDDED_WORKERS} embedded OCR worker(s)")
+    # Enforce TTL and disk quota on OUTPUT_DIR and TEMP_DIR; with
+    # standalone workers, worker.py runs the one sweeper instead
+    start_retention_sweeper(OUTPUT_DIR, TEMP_DIR, job_store, task_queue)
+    readiness["ready"] = True
+
+def check_stores():
+    """Read from the job store, task queue and OCR store; {name: error} for those that fail."""
+    errors = {}
+    checks = {
+        "job_store": lambda: job_store.get_job("readiness-check"),
+        "task_queue": lambda: task_queue.get_job("readiness-check"),
+        "ocr_store": lambda: ocr_store.get_job_receipts("readiness-check"),
+    }
+    for name, check in checks.items():
+        try:
+            check()
+        except Exception as e:
+            logger.error(f"❌ Readiness check of {name} failed: {e}")
+            errors[name] = type(e).__name__
+    return errors
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server accepts connections (and
+    # answers /ready with 503) while the heavy imports and first OCR run
+    thread = threading.Thread(target=run_warm_up, name="warm-up")
+    thread.daemon = True
+    thread.start()
+    
+    # Cancel jobs whose clients have gone away
+    if CANCEL_GRACE_SECONDS > 0:
+        start_abandoned_job_sweeper(interval=min(max(CANCEL_GRACE_SECONDS / 4, 1), 30))
+    yield
+
+app = FastAPI(title="ARCFLOW Receipt Sorter API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +96,22 @@ app.add_middleware(
 def home():
     return {"message": "ARCFLOW API is live 🚀"}
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: 200 once the stores answer and, with embedded
+    workers, the pipeline is imported and Tesseract is primed; 503 before.
+    """
+    store_errors = check_stores()
+    is_ready = readiness["ready"] and not store_errors
+    body = {
+        "ready": is_ready,
+        "error": readiness["error"],
+        "stores": store_errors or "ok",
+        "warmup": readiness["report"],
+    }
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
 BASE_DIR = os.path.dirname(__file__)
 TEMP_DIR = os.path.join(BASE_DIR, "temp_uploads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
@@ -32,49 +119,162 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 os.makedirs(TEMP_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# Global dictionary to store progress queues for each job
-progress_queues = {}
+# Shared job state, progress event log and result locations. Every uvicorn
+# worker / node must point JOB_STORE_URL at the same store.
+job_store = create_job_store()
+
+# Cancel a running job once no SSE client has been connected for this many
+# seconds (0 disables the abandoned-job check)
+CANCEL_GRACE_SECONDS = float(os.environ.get("CANCEL_GRACE_SECONDS", "0"))
 
 def send_progress(job_id: str, message: str):
-    """Send progress message to SSE stream for a specific job."""
-    if job_id in progress_queues:
-        progress_queues[job_id].put(message)
+    """Append a progress message to the job's event log for SSE clients."""
+    job_store.append_event(job_id, message)
+
+# Durable per-image OCR task queue. Workers (`python worker.py`, or the
+# embedded threads below) claim tasks from it; the API only enqueues.
+task_queue = create_task_queue()
+
+# OCR text and candidate dates of every receipt, for search and regrouping
+ocr_store = create_ocr_store()
+
+# OCR worker threads to run inside the API process. The default of one
+# keeps a lone API process (no `python worker.py` deployed) processing
+# jobs; set 0 once standalone workers do all the OCR.
+EMBEDDED_WORKERS = int(os.environ.get("EMBEDDED_WORKERS", "1"))
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Flag a job as cancelled and drop its queued tasks. Running tasks stop at
+    their next OCR attempt. Returns False if the job is unknown or finished.
+    """
+    if not job_store.request_cancel(job_id):
+        return False
+    # Once no task is running any more a worker's finalize sweep releases
+    # the job's files; the API never loads the OCR stack itself
+    task_queue.cancel_job(job_id)
+    return True
+
+def cancel_abandoned_jobs():
+    """
+    Cancel unfinished jobs nobody has listened to for CANCEL_GRACE_SECONDS:
+    counted from the last sign of a client (the upload returning its
+    job_id, an SSE client leaving), or from creation if there was none.
+    Jobs still being uploaded are never cancelled: their client does not
+    have the job_id yet.
+    """
+    now = time.time()
+    job_ids = task_queue.unfinished_jobs()
+    progress = task_queue.get_progress(job_ids)
+    jobs = job_store.get_jobs(job_ids)
+    for job_id, job in jobs.items():
+        if job is None or job["status"] in TERMINAL_STATUSES or job.get("cancel_requested"):
+            continue
+        if job["sse_clients"] > 0:
+            continue
+        if progress.get(job_id, {}).get("total_tasks") is None:
+            continue
+        since = job.get("last_client_seen_at") or job["created_at"]
+        if now - since >= CANCEL_GRACE_SECONDS and cancel_job(job_id):
+            logger.info(f"[Job {job_id}] No SSE client for {CANCEL_GRACE_SECONDS}s, cancelling")
+
+def note_client_activity(jobs):
+    """
+    Polling a job (GET /jobs/{id}, its results, POST /jobs/status) counts
+    as a client watching it, so jobs followed without SSE are not
+    cancelled as abandoned. `jobs` maps job ids to job_store fields.
+    """
+    if CANCEL_GRACE_SECONDS <= 0:
+        return
+    now = time.time()
+    for job_id, job in jobs.items():
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            continue
+        # Few writes however fast clients poll, but well within the grace period
+        if now - (job.get("last_client_seen_at") or 0) >= min(1.0, CANCEL_GRACE_SECONDS / 4):
+            job_store.update_job(job_id, last_client_seen_at=now)
+
+def start_abandoned_job_sweeper(interval):
+    """Run cancel_abandoned_jobs() every `interval` seconds in a daemon thread."""
+    def loop():
+        while True:
+            try:
+                cancel_abandoned_jobs()
+            except Exception as e:
+                logger.error(f"Abandoned-job sweep failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="abandoned-job-sweeper")
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def validate_tier(tier: Optional[str]) -> str:
+    """Check an output size tier from the query string, defaulting to OUTPUT_TIER."""
+    if tier is None:
+        return DEFAULT_OUTPUT_TIER
+    if tier not in OUTPUT_TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tier '{tier}'")
+    return tier
+
+def release_client(job_id):
+    """An SSE client left; the grace period runs from when the last one went away."""
+    remaining = job_store.client_connected(job_id, -1)
+    if remaining <= 0:
+        job_store.update_job(job_id, last_client_seen_at=time.time())
 
 @app.get("/events/{job_id}")
-async def stream_events(job_id: str):
-    """SSE endpoint that streams progress updates for a specific job."""
+async def stream_events(job_id: str, request: Request):
+    """
+    SSE endpoint that streams progress updates for a specific job.
+    Events carry ids, so a client reconnecting with Last-Event-ID (to this
+    or any other worker) resumes where it left off.
+    """
+    if await asyncio.to_thread(job_store.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    # Create queue for this job if it doesn't exist
-    if job_id not in progress_queues:
-        progress_queues[job_id] = Queue()
+    try:
+        last_seq = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        # Not an id we handed out: replay from the start
+        last_seq = 0
     
     async def event_generator():
-        """Generate SSE events from the queue."""
-        queue = progress_queues[job_id]
+        """Generate SSE events from the job's event log."""
+        nonlocal last_seq
+        await asyncio.to_thread(job_store.client_connected, job_id, 1)
         
         try:
             while True:
-                # Non-blocking check with small delay
+                # Poll the shared event log with small delay
                 await asyncio.sleep(0.1)
                 
-                if not queue.empty():
-                    message = queue.get_nowait()
+                events = await asyncio.to_thread(job_store.read_events, job_id, last_seq)
+                for seq, message in events:
+                    last_seq = seq
                     
                     # Send as SSE format
-                    yield f"data: {message}\n\n"
+                    data = message.replace("\n", "\ndata: ")
+                    yield f"id: {seq}\ndata: {data}\n\n"
                     
                     # Check if processing is complete
-                    if "✅ Word document saved" in message or "❌" in message:
+                    if "✅ Word document saved" in message or "❌" in message or "🛑" in message:
                         # Give a moment for final messages
                         await asyncio.sleep(0.5)
-                        break
+                        return
+                
+                # Job ended without a final marker (e.g. the worker died)
+                if not events:
+                    job = await asyncio.to_thread(job_store.get_job, job_id)
+                    if job is None or job["status"] in TERMINAL_STATUSES:
+                        return
                     
         except Exception as e:
             yield f"data: ❌ Stream error: {str(e)}\n\n"
         finally:
-            # Cleanup queue when stream closes
-            if job_id in progress_queues:
-                del progress_queues[job_id]
+            # Shielded so the count is released even when the stream ends
+            # because the client disconnected and the task was cancelled
+            await asyncio.shield(asyncio.to_thread(release_client, job_id))
     
     return StreamingResponse(
         event_generator(),
@@ -87,70 +287,373 @@ async def stream_events(job_id: str):
         }
     )
 
+# Upload helpers. They touch disk and SQLite, so the async upload
+# endpoints run them with asyncio.to_thread to keep the event loop (and
+# every SSE stream on this worker) responsive during large uploads.
+
+def register_job(job_id, job_tmp_dir, output_path, priority, tier, total_files, message):
+    """Register the job so any worker can stream, cancel or serve it."""
+    job_store.create_job(job_id, total_files=total_files, priority=priority, tier=tier)
+    task_queue.create_job(job_id, priority=priority, output_path=output_path, job_tmp_dir=job_tmp_dir, tier=tier)
+    send_progress(job_id, message)
+
+def save_upload(job_tmp_dir, uploaded):
+    """Write one uploaded file to the job directory and return its OCR tasks."""
+    # Keep folder structure so same-named files in different folders don't collide
+    dest_path = unique_upload_path(job_tmp_dir, uploaded.filename)
+    with open(dest_path, "wb") as f:
+        shutil.copyfileobj(uploaded.file, f)
+    # PDFs / multi-frame TIFFs become one task per page, rasterized by the worker
+    return expand_upload(dest_path)
+
+def enqueue_tasks(job_id, tasks):
+    for image_path, payload in tasks:
+        task_queue.enqueue(job_id, image_path, **payload)
+
+def extract_chunk(extractor, job_id, chunk):
+    """Feed one chunk of a ZIP upload and queue the receipts it completed."""
+    for path in extractor.feed(chunk):
+        enqueue_tasks(job_id, expand_upload(path))
+
+def seal_job(job_id):
+    """No more tasks for this job; a worker builds the document once they have all finished."""
+    total = task_queue.seal(job_id)
+    # The client gets the job_id now, so the abandoned-job grace period
+    # starts here rather than when the upload began
+    job_store.update_job(job_id, total_files=total, last_client_seen_at=time.time())
+    return total
+
+def abort_upload(job_id, job_tmp_dir):
+    """Cleanup after a failed upload."""
+    if job_store.get_job(job_id) is not None:
+        cancel_job(job_id)
+    shutil.rmtree(job_tmp_dir, ignore_errors=True)
+
 @app.post("/process-receipts")
-async def process_receipts_endpoint(files: List[UploadFile] = File(...)):
+async def process_receipts_endpoint(
+    files: List[UploadFile] = File(...),
+    priority: Optional[str] = Query(None, description="interactive, normal or bulk"),
+    tier: Optional[str] = Query(None, description="Output size tier: draft, standard or print"),
+):
     """
     Accepts multiple uploaded files, returns job_id immediately.
-    Processing happens in background thread with SSE updates.
+    Each image (or PDF / TIFF page) is enqueued as its own OCR task on the
+    durable task queue; workers share themselves fairly between jobs
+    according to the priority class (uploads with few receipts default to
+    interactive) and report via SSE.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
+    if priority is not None and priority not in PRIORITY_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"Unknown priority '{priority}'")
+    tier = validate_tier(tier)
 
     # Create unique job
     job_id = str(uuid4())
     job_tmp_dir = os.path.join(TEMP_DIR, job_id)
     os.makedirs(job_tmp_dir, exist_ok=True)
 
-    # Initialize progress queue for this job
-    progress_queues[job_id] = Queue()
+    # Output file path
+    output_filename = f"sorted_receipts_{job_id}.docx"
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    saved_paths = []
     try:
-        # Save uploaded files
+        # Save the files first: the default priority depends on how many
+        # receipts they hold once PDFs / TIFFs are split into pages
+        tasks = []
         for uploaded in files:
-            filename = os.path.basename(uploaded.filename)
-            dest_path = os.path.join(job_tmp_dir, filename)
-            with open(dest_path, "wb") as f:
-                content = await uploaded.read()
-                f.write(content)
-            saved_paths.append(dest_path)
-
-        # Output file path
-        output_filename = f"sorted_receipts_{job_id}.docx"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-        
-        # Import the modified function
-        from utils.receipt_sorter import process_receipts_with_sse
+            tasks.extend(await asyncio.to_thread(save_upload, job_tmp_dir, uploaded))
+        priority = priority or default_priority(len(tasks))
         
-        # Start processing in background thread
-        thread = threading.Thread(
-            target=process_receipts_with_sse,
-            args=(saved_paths, output_path, job_id, send_progress, job_tmp_dir)
+        await asyncio.to_thread(
+            register_job, job_id, job_tmp_dir, output_path, priority, tier, len(tasks),
+            f"🚀 Starting receipt processing for {len(files)} files ({len(tasks)} receipts)...",
         )
-        thread.daemon = True
-        thread.start()
+        await asyncio.to_thread(enqueue_tasks, job_id, tasks)
+        
+        total = await asyncio.to_thread(seal_job, job_id)
 
         # Return job_id immediately for client to connect to SSE
         return JSONResponse({
             "job_id": job_id,
             "stream_url": f"/events/{job_id}",
-            "total_files": len(saved_paths)
+            "total_files": total,
+            "priority": priority,
+            "tier": tier
         })
 
-    except Exception as e:
-        # Cleanup on error
-        shutil.rmtree(job_tmp_dir, ignore_errors=True)
-        if job_id in progress_queues:
-            del progress_queues[job_id]
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/download/{filename}")
-def download_file(filename: str):
-    path = os.path.join(OUTPUT_DIR, filename)
-    if not os.path.exists(path):
+    except Exception:
+        # Cleanup on error; the details (paths included) stay in the log
+        logger.exception(f"Upload for job {job_id} failed")
+        await asyncio.to_thread(abort_upload, job_id, job_tmp_dir)
+        raise HTTPException(status_code=500, detail="Failed to process upload")
+
+@app.post("/process-receipts/zip")
+async def process_receipts_zip_endpoint(
+    request: Request,
+    priority: Optional[str] = Query(None, description="interactive, normal or bulk (default bulk)"),
+    tier: Optional[str] = Query(None, description="Output size tier: draft, standard or print"),
+):
+    """
+    Accepts a ZIP archive of receipts as the raw request body
+    (Content-Type: application/zip) and returns job_id once it is in.
+    Entries are extracted while the upload streams and each image is
+    queued for OCR as soon as it is written.
+    """
+    if priority is not None and priority not in PRIORITY_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"Unknown priority '{priority}'")
+    priority = priority or "bulk"
+    tier = validate_tier(tier)
+
+    # Create unique job
+    job_id = str(uuid4())
+    job_tmp_dir = os.path.join(TEMP_DIR, job_id)
+    os.makedirs(job_tmp_dir, exist_ok=True)
+    output_path = os.path.join(OUTPUT_DIR, f"sorted_receipts_{job_id}.docx")
+
+    await asyncio.to_thread(
+        register_job, job_id, job_tmp_dir, output_path, priority, tier, None,
+        f"📦 Extracting receipts from ZIP archive...",
+    )
+
+    extractor = ZipStreamExtractor(job_tmp_dir)
+    try:
+        # Inflating, CRC checks and writes run off the event loop
+        async for chunk in request.stream():
+            await asyncio.to_thread(extract_chunk, extractor, job_id, chunk)
+        await asyncio.to_thread(extractor.close)
+        if not extractor.extracted:
+            raise UploadError("No receipt images found in ZIP archive")
+    except UploadError as e:
+        await asyncio.to_thread(abort_upload, job_id, job_tmp_dir)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception:
+        logger.exception(f"ZIP upload for job {job_id} failed")
+        await asyncio.to_thread(abort_upload, job_id, job_tmp_dir)
+        raise HTTPException(status_code=500, detail="Failed to process upload")
+
+    total = await asyncio.to_thread(seal_job, job_id)
+    await asyncio.to_thread(send_progress, job_id, f"🚀 Extracted {len(extractor.extracted)} files ({total} receipts) from {extractor.entries} archive entries")
+
+    return JSONResponse({
+        "job_id": job_id,
+        "stream_url": f"/events/{job_id}",
+        "total_files": total,
+        "priority": priority,
+        "tier": tier
+    })
+
+@app.delete("/jobs/{job_id}")
+def cancel_job_endpoint(job_id: str):
+    """Cancel a running job; its worker stops at the next OCR attempt."""
+    if not cancel_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found or already finished")
+    return {"job_id": job_id, "status": "cancelling"}
+
+@app.get("/jobs/{job_id}")
+def get_job_endpoint(job_id: str):
+    """Current state of a job, including where its result can be downloaded."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    note_client_activity({job_id: job})
+    job.pop("output_path", None)
+    return {"job_id": job_id, **job}
+
+# Most job ids accepted by one POST /jobs/status call
+JOB_STATUS_BATCH_MAX = int(os.environ.get("JOB_STATUS_BATCH_MAX", "1000"))
+
+@app.get("/jobs/{job_id}/results")
+def get_job_results_endpoint(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Per-receipt results of a job in upload order, one page at a time:
+    date, confidence and match type of the chosen date, how it was found
+    and how long it took. Receipts still queued or running have no date yet.
+    """
+    progress = task_queue.get_job(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = job_store.get_job(job_id)
+    note_client_activity({job_id: job})
+    job = job or {}
+
+    # Regroups point at the source job's uploads
+    upload_dir = progress.get("upload_dir") or progress["job_tmp_dir"]
+    results = []
+    for task in task_queue.get_tasks(job_id, offset=offset, limit=limit):
+        result = task["result"] or {}
+        finished = task["status"] in ("done", "failed", "cancelled")
+        results.append({
+            "seq": task["seq"],
+            "filename": page_label(task["image_path"], task["payload"], upload_dir),
+            "page": task["payload"].get("page"),
+            "status": task["status"],
+            "date": result.get("date"),
+            "confidence": result.get("confidence"),
+            "match_type": result.get("match_type"),
+            "source": result.get("source"),
+            "variant": result.get("variant"),
+            "config": result.get("config"),
+            "hint": result.get("hint"),
+            "ocr_attempts": result.get("attempts"),
+            "ocr_seconds": result.get("ocr_seconds"),
+            "seconds": result.get("seconds"),
+            "task_attempts": task["attempts"],
+            "error": task["error"],
+            "queued_at": task["created_at"],
+            "finished_at": task["updated_at"] if finished else None,
+        })
+
+    total = progress["enqueued"]
+    next_offset = offset + len(results)
+    return {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < total else None,
+        "results": results,
+    }
+
+@app.post("/jobs/status")
+def batch_job_status_endpoint(job_ids: List[str] = Body(..., embed=True)):
+    """
+    Status of many jobs in one call, for clients that track hundreds of
+    jobs without an SSE connection each. Unknown ids map to null.
+    """
+    if len(job_ids) > JOB_STATUS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {JOB_STATUS_BATCH_MAX} job ids per request")
+    jobs = job_store.get_jobs(job_ids)
+    note_client_activity(jobs)
+    progress = task_queue.get_progress([job_id for job_id, job in jobs.items() if job is not None])
+
+    statuses = {}
+    for job_id, job in jobs.items():
+        if job is None:
+            statuses[job_id] = None
+            continue
+        job.pop("output_path", None)
+        counts = progress.get(job_id)
+        if counts is not None:
+            job.update(
+                finished_files=counts["finished"],
+                failed_files=counts["counts"].get("failed", 0),
+            )
+        statuses[job_id] = job
+    return {"jobs": statuses}
+
+@app.post("/jobs/{job_id}/regroup")
+def regroup_job_endpoint(
+    job_id: str,
+    group_by: str = Query("month", description="day, week or month"),
+    tier: Optional[str] = Query(None, description="Output size tier (default: the original job's)"),
+):
+    """
+    Build a new document from a finished job's stored OCR results, grouped
+    by day, week or month. No OCR is run; returns a new job_id to follow
+    via SSE like an upload.
+    """
+    if group_by not in GROUP_BY_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by '{group_by}'")
+    source = job_store.get_job(job_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if source["status"] != "completed":
+        raise HTTPException(status_code=409, detail="Job has not completed")
+    source_progress = task_queue.get_job(job_id)
+    if source_progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    tasks = task_queue.get_tasks(job_id)
+    receipts = {receipt["seq"]: receipt for receipt in ocr_store.get_job_receipts(job_id)}
+    if not receipts:
+        raise HTTPException(status_code=404, detail="No stored OCR results for this job")
+    if any(task["seq"] not in receipts for task in tasks):
+        # Regrouping without them would silently drop receipts
+        raise HTTPException(status_code=409, detail="Some of this job's receipts have no stored OCR results")
+    if not all(os.path.exists(receipt["image_path"]) for receipt in receipts.values()):
+        raise HTTPException(status_code=410, detail="The job's receipt images have been removed")
+    tier = validate_tier(tier or source.get("tier"))
+    # The images stay where the source job (or, for a regroup of a
+    # regroup, its own source) uploaded them
+    upload_dir = source_progress.get("upload_dir") or source_progress["job_tmp_dir"]
+    thumb_dir = source_progress.get("thumb_dir") or os.path.join(source_progress["job_tmp_dir"], "processed")
+
+    new_job_id = str(uuid4())
+    output_path = os.path.join(OUTPUT_DIR, f"sorted_receipts_{new_job_id}.docx")
+    job_store.create_job(new_job_id, total_files=len(tasks), tier=tier, regroup_of=job_id, group_by=group_by)
+    send_progress(new_job_id, f"🚀 Regrouping {len(tasks)} receipts by {group_by} from stored OCR results...")
+
+    # Every receipt goes in already done, with the stored date: no worker
+    # runs OCR, one builds the document once the job is sealed. Thumbnails
+    # already made for the original job are reused.
+    task_queue.create_job(
+        new_job_id,
+        output_path=output_path,
+        job_tmp_dir=os.path.join(TEMP_DIR, new_job_id),
+        upload_dir=upload_dir,
+        thumb_dir=thumb_dir,
+        tier=tier,
+        group_by=group_by,
+        regroup_of=job_id,
+    )
+    for task in tasks:
+        result = dict(task["result"] or {}, date=receipts[task["seq"]]["date"])
+        task_queue.enqueue_done(new_job_id, task["image_path"], result, **task["payload"])
+    task_queue.seal(new_job_id)
+
+    return JSONResponse({
+        "job_id": new_job_id,
+        "stream_url": f"/events/{new_job_id}",
+        "total_files": len(tasks),
+        "group_by": group_by,
+        "tier": tier
+    })
+
+@app.get("/search")
+def search_receipts(
+    q: str = Query(..., min_length=1, description="Words to find in the receipts' OCR text"),
+    job_id: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Full-text search over the stored OCR text of processed receipts."""
+    results = ocr_store.search(q, limit=limit, job_id=job_id)
+    return {
+        "query": q,
+        "results": [
+            {
+                "job_id": r["job_id"],
+                "filename": r["filename"],
+                "date": r["date"],
+                "candidates": r["candidates"],
+                "snippet": r["snippet"],
+            }
+            for r in results
+        ],
+    }
+
+@app.api_route("/download/{filename}", methods=["GET", "HEAD"])
+def download_file(filename: str, request: Request):
+    """
+    Serve a generated document with ETag / Last-Modified validators,
+    conditional GET and HTTP Range so large downloads can resume.
+    """
+    path = os.path.join(OUTPUT_DIR, os.path.basename(filename))
+    if not os.path.isfile(path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(
-        path, 
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
-        filename=filename
-    )
\ No newline at end of file
+    return RangeFileResponse(
+        path,
+        request.headers,
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        filename=os.path.basename(path),
+        method=request.method,
+    )
+
+@app.get("/retention")
+def retention_report():
+    """Bytes reclaimed by the output / temp retention sweeper, across all processes."""
+    return retention_totals(job_store)
@@ -0,0 +1,171 @@
+# backend/tests/test_date_hints.py
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+import utils.date_hints as date_hints
+import utils.receipt_sorter as receipt_sorter
+from utils.date_hints import (
+    parse_hint_modes, filename_date, exif_date, pdf_date, find_hints, hint_window, hint_report,
+)
+
+def test_parse_hint_modes():
+    assert parse_hint_modes("") == {}
+    assert parse_hint_modes(None) == {}
+    assert parse_hint_modes(" EXIF:Accept , filename ,pdf:off,") == {"exif": "accept", "filename": "narrow"}
+
+@pytest.mark.parametrize("spec", ["gps:accept", "exif:maybe", "filename:accept,ocr"])
+def test_parse_hint_modes_rejects_unknown_entries(spec):
+    with pytest.raises(ValueError):
+        parse_hint_modes(spec)
+
+@pytest.mark.parametrize("name, expected", [
+    ("2025-03-14_receipt.jpg", datetime(2025, 3, 14)),
+    ("scan_2025_03_14.png", datetime(2025, 3, 14)),
+    ("2025.03.14.pdf", datetime(2025, 3, 14)),
+    ("IMG_20250314_101500.jpg", datetime(2025, 3, 14)),
+    ("folder/2025-03-14/receipt.jpg", None),  # only the file name counts
+    ("2025-03_14.jpg", None),                 # mixed separators
+    ("receipt_120250314.jpg", None),          # inside a longer number
+    ("2025-13-01.jpg", None),
+    ("2025-02-30.jpg", None),
+    ("1999-12-31.jpg", None),
+    ("2000-01-01.jpg", None),                 # unset camera clock
+    ("2099-01-01_2025-03-14.jpg", datetime(2025, 3, 14)),  # first plausible one
+    ("receipt.jpg", None),
+])
+def test_filename_date(name, expected):
+    assert filename_date(name) == expected
+
+def _image_with_exif(path, original=None, datetime_tag=None):
+    exif = Image.Exif()
+    if datetime_tag:
+        exif[306] = datetime_tag
+    if original:
+        exif.get_ifd(0x8769)[36867] = original
+    Image.new("RGB", (10, 10)).save(path, exif=exif)
+    return str(path)
+
+def test_exif_date(tmp_path):
+    # DateTimeOriginal wins over DateTime, which is only the fallback
+    both = _image_with_exif(tmp_path / "both.jpg", "2025:03:14 10:15:00", "2024:01:02 09:00:00")
+    assert exif_date(both) == datetime(2025, 3, 14)
+    only_datetime = _image_with_exif(tmp_path / "datetime.jpg", datetime_tag="2024:01:02 09:00:00")
+    assert exif_date(only_datetime) == datetime(2024, 1, 2)
+
+def test_exif_date_missing_or_invalid(tmp_path):
+    assert exif_date(_image_with_exif(tmp_path / "none.jpg")) is None
+    assert exif_date(_image_with_exif(tmp_path / "garbage.jpg", "not a date")) is None
+    assert exif_date(_image_with_exif(tmp_path / "unset.jpg", "1970:01:01 00:00:00")) is None
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    assert exif_date(str(tmp_path / "broken.jpg")) is None
+
+@pytest.mark.parametrize("metadata, expected", [
+    ({"creationDate": "D:20250314101500+01'00'"}, datetime(2025, 3, 14)),
+    ({"creationDate": "20250314"}, datetime(2025, 3, 14)),
+    ({"creationDate": "D:1999"}, None),
+    ({"creationDate": "D:19700101000000Z"}, None),
+    ({}, None),
+])
+def test_pdf_date(monkeypatch, metadata, expected):
+    monkeypatch.setattr(date_hints, "pdf_metadata", lambda path: metadata)
+    assert pdf_date("receipt.pdf") == expected
+
+def test_pdf_date_unreadable(monkeypatch):
+    def broken(path):
+        raise RuntimeError("cannot open")
+    monkeypatch.setattr(date_hints, "pdf_metadata", broken)
+    assert pdf_date("receipt.pdf") is None
+
+def test_find_hints_in_source_order(tmp_path):
+    path = _image_with_exif(tmp_path / "2025-03-20_receipt.jpg", "2025:03:14 10:15:00")
+    hints = find_hints(path, modes={"filename": "accept", "exif": "narrow"})
+    assert [(h["source"], h["mode"], h["date"]) for h in hints] == [
+        ("exif", "narrow", datetime(2025, 3, 14)),
+        ("filename", "accept", datetime(2025, 3, 20)),
+    ]
+    # Disabled sources are not read
+    assert [h["source"] for h in find_hints(path, modes={"filename": "narrow"})] == ["filename"]
+    assert find_hints(path, modes={}) == []
+
+def test_find_hints_skips_exif_of_later_frames(tmp_path):
+    path = _image_with_exif(tmp_path / "receipt.jpg", "2025:03:14 10:15:00")
+    assert find_hints(path, page=0, modes={"exif": "narrow"})
+    assert find_hints(path, page=1, modes={"exif": "narrow"}) == []
+
+def test_hint_window():
+    hint = {"date": datetime(2025, 3, 14)}
+    assert hint_window(hint, days=7) == (datetime(2025, 3, 7), datetime(2025, 3, 21))
+    assert hint_window(hint, days=0) == (hint["date"], hint["date"])
+
+def test_hint_report():
+    results = [
+        None,  # unfinished task
+        {"source": "hint_filename", "hint": {"source": "filename", "mode": "accept"}, "hints_found": ["filename", "exif"]},
+        {"source": "ocr", "ocr_seconds": 2.0, "hint": {"source": "exif", "mode": "narrow", "agreed": True, "extra_seconds": 0.5}},
+        {"source": "ocr", "ocr_seconds": 4.0, "hint": {"source": "exif", "mode": "narrow", "agreed": False, "extra_seconds": 1.25}},
+        {"source": "ocr", "ocr_seconds": 3.0, "hint": None},
+    ]
+    assert hint_report(results) == {
+        "receipts": 4,
+        "with_hint": 3,
+        "by_source": {"filename": 1, "exif": 3},
+        "accepted": 1,
+        "narrowed": 2,
+        "agreed": 1,
+        "ocr_seconds_saved": 3.0,  # one accepted receipt × 3s mean OCR time
+        "narrow_seconds_added": 1.8,
+    }
+
+def test_hint_report_without_ocr():
+    report = hint_report([{"source": "hint_exif", "hint": {"source": "exif", "mode": "accept"}}])
+    assert report["accepted"] == 1
+    assert report["ocr_seconds_saved"] is None
+
+# extract_date_details with a hint window, OCR replaced by canned text per config
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    texts = {}
+    monkeypatch.setattr(receipt_sorter, "_load_grayscale", lambda path: None)
+    monkeypatch.setattr(receipt_sorter, "PREPROCESS_VARIANTS", {"plain": lambda gray: gray})
+    monkeypatch.setattr(receipt_sorter.pytesseract, "image_to_string", lambda image, config: texts.get(config, ""))
+
+    def run(pages, **kwargs):
+        texts.clear()
+        texts.update({f"config-{i}": text for i, text in enumerate(pages)})
+        strategy = [("plain", f"config-{i}") for i in range(len(pages))]
+        return receipt_sorter.extract_date_details("receipt.png", strategy=strategy, **kwargs)
+    return run
+
+WINDOW = (datetime(2025, 3, 10), datetime(2025, 3, 20))
+
+def test_no_hint_stops_at_first_date(fake_ocr):
+    details = fake_ocr(["TOTAL 02/28/2025", "TOTAL 03/14/2025"])
+    assert details["date"] == "February 28, 2025"
+    assert details["attempts"] == 1
+    assert not details["hint_agreed"]
+
+def test_hint_agrees_on_first_attempt(fake_ocr):
+    details = fake_ocr(["TOTAL 03/14/2025", "TOTAL 02/28/2025"], hint_window=WINDOW, hint_extra_attempts=3)
+    assert details["date"] == "March 14, 2025"
+    assert details["hint_agreed"]
+    assert (details["attempts"], details["hint_extra_attempts"]) == (1, 0)
+
+def test_hint_keeps_searching_past_a_date_outside_the_window(fake_ocr):
+    details = fake_ocr(["TOTAL 02/28/2025", "", "TOTAL 03/18/2025"], hint_window=WINDOW, hint_extra_attempts=3)
+    assert details["date"] == "March 18, 2025"
+    assert details["hint_agreed"]
+    assert (details["attempts"], details["hint_extra_attempts"]) == (3, 2)
+
+def test_extra_attempts_are_capped(fake_ocr):
+    pages = ["TOTAL 02/28/2025"] + [""] * 39
+    details = fake_ocr(pages, hint_window=WINDOW, hint_extra_attempts=3)
+    # Nothing inside the window: the date found first is kept
+    assert details["date"] == "February 28, 2025"
+    assert not details["hint_agreed"]
+    assert (details["attempts"], details["hint_extra_attempts"]) == (4, 3)
+
+    uncapped = fake_ocr(pages, hint_window=WINDOW)
+    assert (uncapped["attempts"], uncapped["hint_extra_attempts"]) == (40, 39)
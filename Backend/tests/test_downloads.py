@@ -0,0 +1,109 @@
+# backend/tests/test_downloads.py
+import asyncio
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from utils.downloads import RangeFileResponse, RangeNotSatisfiable, parse_range
+
+BODY = bytes(range(256)) * 4  # 1024 bytes
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("Bytes = 5-5", (5, 5)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(BODY)) == expected
+
+@pytest.mark.parametrize("header", ["items=0-10", "bytes=0-1,5-9", "bytes=a-b", "bytes=-x"])
+def test_parse_range_ignores_unhandled_headers(header):
+    assert parse_range(header, len(BODY)) is None
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=10-5", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, len(BODY))
+
+@pytest.fixture
+def receipt_doc(tmp_path):
+    path = tmp_path / "sorted.docx"
+    path.write_bytes(BODY)
+    return str(path)
+
+@pytest.fixture
+def client(receipt_doc):
+    async def download(request):
+        return RangeFileResponse(
+            receipt_doc, request.headers, media_type="application/octet-stream",
+            filename="sorted.docx", method=request.method,
+        )
+    app = Starlette(routes=[Route("/doc", download, methods=["GET", "HEAD"])])
+    return TestClient(app)
+
+def test_full_download(client):
+    response = client.get("/doc")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(BODY))
+    assert 'filename="sorted.docx"' in response.headers["content-disposition"]
+
+def test_range_download(client):
+    response = client.get("/doc", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == BODY[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+
+def test_range_not_satisfiable(client):
+    response = client.get("/doc", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+    assert response.content == b""
+
+def test_conditional_get(client):
+    first = client.get("/doc")
+    assert client.get("/doc", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert client.get("/doc", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+    assert client.get("/doc", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_if_range_with_stale_validator_sends_whole_file(client):
+    response = client.get("/doc", headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+def test_head_has_headers_but_no_body(client):
+    response = client.head("/doc")
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.content == b""
+
+def test_zero_copy_send_gets_a_file_object(receipt_doc):
+    response = RangeFileResponse(
+        receipt_doc, {"range": "bytes=100-199"}, media_type="application/octet-stream", filename="sorted.docx",
+    )
+    sent = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            # Read while the response still has the file open, as a server would
+            f = message["file"]
+            os.lseek(f.fileno(), message["offset"], os.SEEK_SET)
+            message = dict(message, data=f.read(message["count"]))
+        sent.append(message)
+
+    scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+    asyncio.run(response(scope, None, send))
+
+    start, body = sent
+    assert start["status"] == 206
+    assert body["type"] == "http.response.zerocopysend"
+    assert hasattr(body["file"], "fileno") and body["file"].closed
+    assert (body["offset"], body["count"]) == (100, 100)
+    assert body["data"] == BODY[100:200]
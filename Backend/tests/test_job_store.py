@@ -0,0 +1,108 @@
+# backend/tests/test_job_store.py
+import time
+
+import pytest
+
+from utils.job_store import SQLiteJobStore, RedisJobStore, LocalRedis
+
+# Every test runs against both implementations
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "jobs.db"))
+    return RedisJobStore(LocalRedis())
+
+def test_create_update_and_get(store):
+    store.create_job("job", total_files=3, tier="draft")
+    job = store.get_job("job")
+    assert (job["status"], job["total_files"], job["tier"], job["sse_clients"]) == ("queued", 3, "draft", 0)
+    assert job["created_at"] <= time.time()
+
+    store.update_job("job", status="running", hints={"accepted": 1})
+    job = store.get_job("job")
+    assert (job["status"], job["total_files"], job["hints"]) == ("running", 3, {"accepted": 1})
+
+def test_unknown_jobs(store):
+    assert store.get_job("nope") is None
+    # Updating a job that does not exist must not create it
+    store.update_job("nope", status="running")
+    assert store.get_job("nope") is None
+    store.create_job("job")
+    jobs = store.get_jobs(["job", "nope", "job"])
+    assert set(jobs) == {"job", "nope"}
+    assert jobs["job"]["status"] == "queued" and jobs["nope"] is None
+
+def test_writers_of_different_fields_do_not_overwrite_each_other(store):
+    # The API flags a cancel while a worker updates the status
+    store.create_job("job", total_files=2)
+    store.request_cancel("job")
+    store.update_job("job", status="running")
+    store.update_job("job", total_files=3)
+    job = store.get_job("job")
+    assert (job["status"], job["total_files"], job["cancel_requested"]) == ("running", 3, True)
+
+def test_redis_job_fields_are_separate_hash_fields():
+    client = LocalRedis()
+    store = RedisJobStore(client, prefix="test")
+    store.create_job("job", tier="draft")
+    store.update_job("job", cancel_requested=True)
+    raw = client.hgetall("test:job:job")
+    assert {"status", "created_at", "tier", "cancel_requested", "sse_clients"} <= set(raw)
+    assert raw["tier"] == '"draft"' and raw["cancel_requested"] == "true"
+
+def test_events_in_order(store):
+    store.create_job("job")
+    assert [store.append_event("job", m) for m in ("a", "b", "c")] == [1, 2, 3]
+    assert [tuple(e) for e in store.read_events("job")] == [(1, "a"), (2, "b"), (3, "c")]
+    assert [tuple(e) for e in store.read_events("job", after=2)] == [(3, "c")]
+    assert list(store.read_events("other")) == []
+
+def test_request_cancel(store):
+    assert not store.request_cancel("nope")
+    store.create_job("job")
+    assert not store.is_cancel_requested("job")
+    assert store.request_cancel("job")
+    assert store.is_cancel_requested("job")
+    store.create_job("done", status="completed")
+    assert not store.request_cancel("done")
+
+def test_client_count_never_goes_negative(store):
+    store.create_job("job")
+    assert store.client_connected("job", 1) == 1
+    assert store.client_connected("job", -1) == 0
+    # A release without a matching connect leaves the count at 0 ...
+    assert store.client_connected("job", -1) == 0
+    assert store.get_job("job")["sse_clients"] == 0
+    # ... so the next client counts as one
+    assert store.client_connected("job", 1) == 1
+
+def test_stats(store):
+    assert store.get_stats("retention") == {}
+    store.add_stats("retention", {"sweeps": 1, "bytes": 10}, last={"at": 1})
+    store.add_stats("retention", {"sweeps": 1, "bytes": 5}, last={"at": 2})
+    assert store.get_stats("retention") == {"sweeps": 2, "bytes": 15, "last": {"at": 2}}
+
+def test_local_redis_reads_do_not_create_keys():
+    client = LocalRedis()
+    store = RedisJobStore(client)
+    store.get_job("nope")
+    store.read_events("nope")
+    store.get_stats("nope")
+    client.zrange("zset", 0, -1)
+    client.hdel("hash", "field")
+    assert client._data == {}
+
+def test_local_redis_expiry_and_empty_keys():
+    client = LocalRedis()
+    client.expire("missing", 60)
+    client.hset("hash", {"a": 1})
+    assert client._expiry == {}
+    client.expire("hash", 0.01)
+    time.sleep(0.02)
+    assert client.hgetall("hash") == {}
+    # Emptied hashes and sorted sets disappear, as in Redis
+    client.hset("hash", {"a": 1})
+    client.hdel("hash", "a")
+    client.zadd("zset", {"m": 1})
+    client.zrem("zset", "m")
+    assert client._data == {}
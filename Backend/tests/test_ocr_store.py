@@ -0,0 +1,71 @@
+# backend/tests/test_ocr_store.py
+import pytest
+
+from utils.ocr_store import OCRStore
+
+# Every test runs with FTS5 and with the LIKE fallback for SQLite builds without it
+@pytest.fixture(params=["fts", "like"])
+def store(request, tmp_path):
+    store = OCRStore(str(tmp_path / "ocr_text.db"))
+    if request.param == "like":
+        store.fts = False
+    elif not store.fts:
+        pytest.skip("SQLite has no FTS5")
+    return store
+
+def test_save_and_get_in_upload_order(store):
+    store.save("job", 2, "b.png", "/tmp/b.png", "March 28, 2025", text="GAS station", source="ocr")
+    store.save("job", 1, "a/r.png", "/tmp/a/r.png", "March 14, 2025", text="COFFEE latte",
+               candidates=[{"date": "March 14, 2025", "confidence": "high"}], source="ocr")
+    store.save("other", 1, "c.png", "/tmp/c.png", "Unknown Date")
+
+    receipts = store.get_job_receipts("job")
+    assert [(r["seq"], r["filename"], r["date"]) for r in receipts] == [
+        (1, "a/r.png", "March 14, 2025"),
+        (2, "b.png", "March 28, 2025"),
+    ]
+    assert receipts[0]["candidates"] == [{"date": "March 14, 2025", "confidence": "high"}]
+    assert receipts[1]["candidates"] == []
+    assert store.get_job_receipts("nope") == []
+
+def test_retried_task_replaces_its_receipt(store):
+    store.save("job", 1, "r.png", "/tmp/r.png", "Unknown Date", text="first attempt COFFEE")
+    store.save("job", 1, "r.png", "/tmp/r.png", "March 14, 2025", text="second attempt TEA")
+
+    receipts = store.get_job_receipts("job")
+    assert len(receipts) == 1
+    assert (receipts[0]["date"], receipts[0]["text"]) == ("March 14, 2025", "second attempt TEA")
+    # The old text is gone from the index as well
+    assert store.search("coffee") == []
+    assert [r["seq"] for r in store.search("tea")] == [1]
+
+def test_search_text_and_filename(store):
+    store.save("job", 1, "coffee_shop.png", "/tmp/1.png", "March 14, 2025", text="TOTAL 4.50")
+    store.save("job", 2, "r.png", "/tmp/2.png", "March 28, 2025", text="Blue Bottle COFFEE latte")
+    store.save("other", 1, "r.png", "/tmp/3.png", "April 02, 2025", text="coffee beans")
+
+    assert {(r["job_id"], r["seq"]) for r in store.search("coffee")} == {("job", 1), ("job", 2), ("other", 1)}
+    assert sorted(r["seq"] for r in store.search("coffee", job_id="job")) == [1, 2]
+    assert len(store.search("coffee", limit=1)) == 1
+    match = store.search("latte")[0]
+    assert match["date"] == "March 28, 2025"
+    assert "latte" in match["snippet"].lower()
+
+@pytest.mark.parametrize("query", ['coffee"', "AND", "(latte", "50%", "c_ffee"])
+def test_invalid_fts_syntax_falls_back(store, query):
+    store.save("job", 1, "r.png", "/tmp/r.png", "March 14, 2025", text="COFFEE latte 50% off")
+    # Searched as plain text instead of raising
+    assert isinstance(store.search(query), list)
+
+def test_like_wildcards_are_literal(store):
+    store.save("job", 1, "r.png", "/tmp/r.png", "March 14, 2025", text="COFFEE latte")
+    assert store.search("c_ffee") == []
+    assert store.search("%") == []
+
+def test_fts_syntax(store):
+    if not store.fts:
+        pytest.skip("FTS5 query syntax only")
+    store.save("job", 1, "a.png", "/tmp/a.png", "March 14, 2025", text="coffee")
+    store.save("job", 2, "b.png", "/tmp/b.png", "March 15, 2025", text="tea")
+    store.save("job", 3, "c.png", "/tmp/c.png", "March 16, 2025", text="juice")
+    assert sorted(r["seq"] for r in store.search("coffee OR tea")) == [1, 2]
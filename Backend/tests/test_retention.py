@@ -0,0 +1,94 @@
+# backend/tests/test_retention.py
+import os
+import time
+
+import pytest
+
+from utils.job_store import RedisJobStore, LocalRedis
+from utils.retention import sweep, retention_report, OUTPUT_TTL_SECONDS, TEMP_TTL_SECONDS
+
+DAY = 24 * 3600
+
+@pytest.fixture
+def dirs(tmp_path):
+    output_dir, temp_dir = tmp_path / "output", tmp_path / "temp_uploads"
+    output_dir.mkdir()
+    temp_dir.mkdir()
+    return str(output_dir), str(temp_dir)
+
+def _document(output_dir, job_id, size, age):
+    path = os.path.join(output_dir, f"sorted_receipts_{job_id}.docx")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    _age(path, age)
+    return path
+
+def _job_dir(temp_dir, job_id, size, age):
+    path = os.path.join(temp_dir, job_id)
+    os.makedirs(os.path.join(path, "processed"))
+    with open(os.path.join(path, "processed", "receipt.png"), "wb") as f:
+        f.write(b"x" * size)
+    _age(path, age)
+    return path
+
+def _age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+def test_expired_entries_are_removed(dirs):
+    output_dir, temp_dir = dirs
+    old_doc = _document(output_dir, "old", 10, OUTPUT_TTL_SECONDS + DAY)
+    new_doc = _document(output_dir, "new", 10, DAY)
+    # Temp folders expire sooner than documents of the same age
+    old_dir = _job_dir(temp_dir, "old", 100, TEMP_TTL_SECONDS + 60)
+
+    stats = sweep(output_dir, temp_dir, quota_bytes=10 ** 9)
+    assert not os.path.exists(old_doc) and not os.path.exists(old_dir)
+    assert os.path.exists(new_doc)
+    assert (stats["entries_deleted"], stats["bytes_reclaimed"], stats["bytes_remaining"]) == (2, 110, 10)
+
+def test_quota_removes_oldest_first(dirs):
+    output_dir, temp_dir = dirs
+    oldest = _document(output_dir, "a", 100, 3 * 60)
+    middle = _job_dir(temp_dir, "b", 100, 2 * 60)
+    newest = _document(output_dir, "c", 100, 60)
+
+    stats = sweep(output_dir, temp_dir, quota_bytes=150)
+    assert not os.path.exists(oldest) and not os.path.exists(middle)
+    assert os.path.exists(newest)
+    assert (stats["entries_deleted"], stats["bytes_remaining"]) == (2, 100)
+
+def test_expired_entries_go_even_under_quota_then_quota_applies(dirs):
+    output_dir, temp_dir = dirs
+    expired = _document(output_dir, "a", 10, OUTPUT_TTL_SECONDS + 60)
+    older = _document(output_dir, "b", 100, 2 * 60)
+    newer = _document(output_dir, "c", 100, 60)
+
+    # Removing the expired entry alone does not get under the quota
+    sweep(output_dir, temp_dir, quota_bytes=150)
+    assert [os.path.exists(p) for p in (expired, older, newer)] == [False, False, True]
+
+def test_active_jobs_are_never_touched(dirs):
+    output_dir, temp_dir = dirs
+    active_doc = _document(output_dir, "running", 100, OUTPUT_TTL_SECONDS + DAY)
+    active_dir = _job_dir(temp_dir, "running", 100, TEMP_TTL_SECONDS + DAY)
+    other = _document(output_dir, "done", 100, 60)
+
+    stats = sweep(output_dir, temp_dir, is_active=lambda job_id: job_id == "running", quota_bytes=0)
+    assert os.path.exists(active_doc) and os.path.exists(active_dir)
+    assert not os.path.exists(other)
+    assert (stats["entries_deleted"], stats["bytes_remaining"]) == (1, 200)
+
+def test_stats_are_totalled_in_the_store(dirs):
+    output_dir, temp_dir = dirs
+    store = RedisJobStore(LocalRedis())
+    assert retention_report(store)["sweeps"] == 0
+
+    _document(output_dir, "a", 10, OUTPUT_TTL_SECONDS + 60)
+    sweep(output_dir, temp_dir, quota_bytes=10 ** 9, stats_store=store)
+    _document(output_dir, "b", 20, OUTPUT_TTL_SECONDS + 60)
+    last = sweep(output_dir, temp_dir, quota_bytes=10 ** 9, stats_store=store)
+
+    report = retention_report(store)
+    assert (report["sweeps"], report["entries_deleted"], report["bytes_reclaimed"]) == (2, 2, 30)
+    assert report["last_sweep"] == last
@@ -0,0 +1,178 @@
+# backend/tests/test_task_queue.py
+import time
+
+import pytest
+
+from utils.job_store import LocalRedis
+from utils.task_queue import SQLiteTaskQueue, RedisTaskQueue
+
+# Every test runs against both implementations
+@pytest.fixture(params=["sqlite", "redis"])
+def queue(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteTaskQueue(str(tmp_path / "tasks.db"), max_attempts=2)
+    return RedisTaskQueue(LocalRedis(), max_attempts=2)
+
+def test_claim_in_upload_order_and_complete(queue):
+    queue.create_job("job")
+    assert queue.enqueue("job", "a.png") == 1
+    assert queue.enqueue("job", "b.png", page=0) == 2
+
+    first = queue.claim("w1", lease_seconds=60)
+    second = queue.claim("w2", lease_seconds=60)
+    assert (first["image_path"], second["image_path"]) == ("a.png", "b.png")
+    assert second["payload"] == {"page": 0}
+    assert first["attempts"] == 1
+    # Both are leased, nothing left to hand out
+    assert queue.claim("w3", lease_seconds=60) is None
+
+    assert queue.complete(first["task_id"], "w1", {"date": "March 14, 2025"})
+    # Only the lease holder can complete a task
+    assert not queue.complete(second["task_id"], "w1", {"date": "x"})
+    assert queue.get_tasks("job")[0]["result"] == {"date": "March 14, 2025"}
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+    task = queue.claim("w1", lease_seconds=0.05)
+    time.sleep(0.1)
+
+    again = queue.claim("w2", lease_seconds=60)
+    assert again["task_id"] == task["task_id"]
+    assert again["attempts"] == 2
+    # The first worker lost its lease
+    assert not queue.complete(task["task_id"], "w1", {})
+    assert queue.complete(task["task_id"], "w2", {})
+
+def test_extend_lease_keeps_task_hidden(queue):
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+    task = queue.claim("w1", lease_seconds=0.05)
+    queue.extend_lease(task["task_id"], "w1", 60)
+    time.sleep(0.1)
+    assert queue.claim("w2", lease_seconds=60) is None
+
+def test_fail_retries_until_out_of_attempts(queue):
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+
+    task = queue.claim("w1", lease_seconds=60)
+    assert queue.fail(task["task_id"], "w1", "boom", retry_delay=0) == "queued"
+    task = queue.claim("w1", lease_seconds=60)
+    assert task["attempts"] == 2
+    assert queue.fail(task["task_id"], "w1", "boom", retry_delay=0) == "failed"
+    assert queue.claim("w1", lease_seconds=60) is None
+
+    (stored,) = queue.get_tasks("job")
+    assert (stored["status"], stored["error"]) == ("failed", "boom")
+
+def test_reap_fails_last_attempt_of_dead_worker(queue):
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+    queue.claim("w1", lease_seconds=0.01)
+    time.sleep(0.02)
+    queue.claim("w2", lease_seconds=0.01)
+    time.sleep(0.02)
+
+    assert queue.reap_expired() == ["job"]
+    assert queue.get_tasks("job")[0]["status"] == "failed"
+
+def test_fair_share_follows_priority(queue):
+    queue.create_job("bulk", priority="bulk")
+    queue.create_job("interactive", priority="interactive")
+    for i in range(4):
+        queue.enqueue("bulk", f"b{i}.png")
+        queue.enqueue("interactive", f"i{i}.png")
+
+    served = [queue.claim("w", lease_seconds=60)["job_id"] for _ in range(4)]
+    assert served.count("interactive") > served.count("bulk")
+
+def test_no_finalize_before_seal(queue):
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+    task = queue.claim("w1", lease_seconds=60)
+    queue.complete(task["task_id"], "w1", {})
+
+    # More files may still be arriving
+    assert not queue.claim_finalize("job", "w1")
+    assert queue.finalizable_jobs() == []
+
+def test_seal_race_job_is_finalized_by_sweep(queue):
+    # The last task finishes before the upload is sealed: its worker's
+    # claim_finalize fails, so the sweep must pick the job up
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+    task = queue.claim("w1", lease_seconds=60)
+    queue.complete(task["task_id"], "w1", {})
+    assert not queue.claim_finalize("job", "w1")
+
+    assert queue.seal("job") == 1
+    assert queue.finalizable_jobs() == ["job"]
+    assert queue.claim_finalize("job", "w2")
+    assert queue.finalizable_jobs() == []
+
+def test_job_without_tasks_is_finalizable(queue):
+    queue.create_job("empty")
+    assert queue.seal("empty") == 0
+    assert queue.finalizable_jobs() == ["empty"]
+
+def test_claim_finalize_has_one_winner(queue):
+    queue.create_job("job")
+    queue.seal("job")
+    assert queue.claim_finalize("job", "w1")
+    assert not queue.claim_finalize("job", "w2")
+
+    queue.finish_finalize("job")
+    assert not queue.claim_finalize("job", "w2")
+    assert queue.unfinished_jobs() == []
+
+def test_stale_finalize_claim_is_released(queue):
+    queue.create_job("job")
+    queue.seal("job")
+    assert queue.claim_finalize("job", "w1")
+    time.sleep(0.05)
+
+    # A renewed claim survives the reaper...
+    queue.extend_finalize("job", "w1")
+    assert queue.reap_expired(finalize_lease_seconds=0.04) == []
+    # ...one that is not renewed goes back to the pool
+    time.sleep(0.05)
+    assert queue.reap_expired(finalize_lease_seconds=0.04) == ["job"]
+    assert queue.claim_finalize("job", "w2")
+
+def test_cancel_job_seals_and_cancels_unfinished_tasks(queue):
+    queue.create_job("job")
+    queue.enqueue("job", "a.png")
+    queue.enqueue("job", "b.png")
+    task = queue.claim("w1", lease_seconds=60)
+    queue.complete(task["task_id"], "w1", {})
+
+    assert queue.cancel_job("job") == 1
+    assert queue.get_job("job")["counts"] == {"done": 1, "cancelled": 1}
+    assert queue.claim_finalize("job", "w1")
+
+def test_enqueue_done_needs_no_worker(queue):
+    queue.create_job("regroup")
+    queue.enqueue_done("regroup", "a.png", {"date": "March 14, 2025"}, page=2)
+    queue.seal("regroup")
+
+    assert queue.claim("w1", lease_seconds=60) is None
+    (task,) = queue.get_tasks("regroup")
+    assert (task["status"], task["result"], task["payload"]) == ("done", {"date": "March 14, 2025"}, {"page": 2})
+    assert queue.claim_finalize("regroup", "w1")
+
+def test_progress_and_task_pages(queue):
+    queue.create_job("job", priority="bulk", output_path="out.docx")
+    for name in ("a.png", "b.png", "c.png"):
+        queue.enqueue("job", name)
+    task = queue.claim("w1", lease_seconds=60)
+    queue.complete(task["task_id"], "w1", {"date": "March 14, 2025"})
+
+    assert queue.get_progress(["job", "nope"]) == {
+        "job": {"total_tasks": None, "enqueued": 3, "finished": 1, "counts": {"done": 1, "queued": 2}},
+    }
+    queue.seal("job")
+    job = queue.get_job("job")
+    assert (job["output_path"], job["priority"], job["total_tasks"]) == ("out.docx", "bulk", 3)
+    assert [t["image_path"] for t in queue.get_tasks("job", offset=1, limit=1)] == ["b.png"]
+    assert [t["seq"] for t in queue.get_tasks("job")] == [1, 2, 3]
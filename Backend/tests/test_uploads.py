@@ -0,0 +1,118 @@
+# backend/tests/test_uploads.py
+import io
+import os
+import zipfile
+
+import pytest
+
+from utils.uploads import ZipStreamExtractor, UploadError, safe_relative_path
+
+class _Unseekable(io.RawIOBase):
+    """Write-only stream; zipfile then writes data descriptors after each entry."""
+
+    def __init__(self):
+        self.buf = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buf.write(data)
+
+def make_zip(entries, compression=zipfile.ZIP_DEFLATED, streamed=False):
+    out = _Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(out, "w", compression) as z:
+        for name, data in entries.items():
+            z.writestr(name, data)
+    return (out.buf if streamed else out).getvalue()
+
+def extract(tmp_path, archive, chunk_size=7, **limits):
+    extractor = ZipStreamExtractor(str(tmp_path), **limits)
+    paths = []
+    for i in range(0, len(archive), chunk_size):
+        paths += extractor.feed(archive[i:i + chunk_size])
+    extractor.close()
+    return paths
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED])
+def test_extracts_receipts_only(tmp_path, compression):
+    archive = make_zip({
+        "2025/a.png": b"png" * 1000,
+        "b.pdf": b"%PDF-1.4",
+        "notes.txt": b"skip me",
+        "__MACOSX/._a.png": b"metadata",
+    }, compression)
+    paths = extract(tmp_path, archive)
+    assert [os.path.relpath(p, tmp_path) for p in paths] == [os.path.join("2025", "a.png"), "b.pdf"]
+    assert read(paths[0]) == b"png" * 1000
+
+def test_deflated_entries_with_data_descriptors(tmp_path):
+    archive = make_zip({"a.jpg": b"a" * 5000, "b.jpg": os.urandom(3000)}, streamed=True)
+    # The archive really does use data descriptors (general purpose flag bit 3)
+    assert int.from_bytes(archive[6:8], "little") & 0x8
+    paths = extract(tmp_path, archive, chunk_size=100)
+    assert read(paths[0]) == b"a" * 5000
+    assert len(paths) == 2
+
+def test_stored_entry_with_data_descriptor_is_rejected(tmp_path):
+    archive = make_zip({"a.jpg": b"abc"}, zipfile.ZIP_STORED, streamed=True)
+    with pytest.raises(UploadError):
+        extract(tmp_path, archive)
+
+def test_truncated_archive(tmp_path):
+    archive = make_zip({"a.png": os.urandom(4000)})
+    with pytest.raises(UploadError, match="truncated"):
+        extract(tmp_path, archive[:len(archive) // 2])
+    # The partial entry is not left behind
+    assert os.listdir(tmp_path) == []
+
+def test_zip_bomb_ratio(tmp_path):
+    archive = make_zip({"bomb.png": b"\0" * (4 * 1024 * 1024)})
+    with pytest.raises(UploadError, match="compression ratio") as exc:
+        extract(tmp_path, archive, chunk_size=64 * 1024, max_ratio=100)
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+def test_entry_and_total_size_limits(tmp_path):
+    archive = make_zip({"a.png": os.urandom(2000), "b.png": os.urandom(2000)})
+    with pytest.raises(UploadError, match="larger than"):
+        extract(tmp_path / "entry", archive, max_entry_bytes=1000)
+    with pytest.raises(UploadError, match="expands to more than"):
+        extract(tmp_path / "total", archive, max_total_bytes=3000)
+
+def test_entry_count_limit(tmp_path):
+    archive = make_zip({f"{i}.png": b"x" for i in range(3)})
+    with pytest.raises(UploadError, match="more than 2 entries"):
+        extract(tmp_path, archive, max_entries=2)
+
+def test_crc_mismatch(tmp_path):
+    archive = bytearray(make_zip({"a.png": b"hello receipt"}, zipfile.ZIP_STORED))
+    archive[30 + len("a.png")] ^= 0xFF  # first data byte
+    with pytest.raises(UploadError, match="CRC"):
+        extract(tmp_path, bytes(archive))
+
+def test_not_a_zip(tmp_path):
+    with pytest.raises(UploadError, match="Not a ZIP"):
+        extract(tmp_path, b"GIF89a not a zip archive")
+
+def test_path_traversal_stays_in_job_dir(tmp_path):
+    job_dir = tmp_path / "job"
+    archive = make_zip({"../../evil.png": b"x", "/abs/path.png": b"y", "..\\win.png": b"z"})
+    paths = extract(job_dir, archive)
+    assert len(paths) == 3
+    for path in paths:
+        assert os.path.realpath(path).startswith(os.path.realpath(job_dir) + os.sep)
+
+@pytest.mark.parametrize("name, expected", [
+    ("../../etc/passwd", os.path.join("etc", "passwd")),
+    ("..\\..\\x.png", "x.png"),
+    ("/abs/./a.png", os.path.join("abs", "a.png")),
+    ("a:b*?.png", "a_b__.png"),
+    ("..", "upload"),
+])
+def test_safe_relative_path(name, expected):
+    assert safe_relative_path(name) == expected
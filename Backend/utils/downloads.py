@@ -0,0 +1,132 @@
+# backend/utils/downloads.py
+import os
+import asyncio
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.responses import Response
+
+# Bytes per read when the server can't do zero-copy sends
+CHUNK_SIZE = 256 * 1024
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def file_etag(stat):
+    """Strong validator from size and mtime; changes whenever the file is rewritten."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header into (start, end)
+    inclusive. Returns None for headers we don't handle (multiple ranges,
+    other units) so the full file is sent; raises RangeNotSatisfiable
+    for ranges outside the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+def _not_modified(headers, etag, mtime):
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class RangeFileResponse(Response):
+    """
+    File response with ETag / Last-Modified, conditional GET (304) and
+    single HTTP Range requests (206) so interrupted downloads can resume.
+    The body goes out through the ASGI zero-copy send extension
+    (sendfile) when the server offers it, else in os.pread chunks.
+    """
+
+    def __init__(self, path, request_headers, media_type, filename, method="GET"):
+        self.path = path
+        self.method = method
+        stat = os.stat(path)
+        etag = file_etag(stat)
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+            "cache-control": "private, max-age=0, must-revalidate",
+            "content-disposition": f'attachment; filename="{filename}"',
+        }
+        self.offset, self.count = 0, stat.st_size
+        status_code = 200
+
+        if _not_modified(request_headers, etag, stat.st_mtime):
+            status_code, self.count = 304, 0
+        elif "range" in request_headers:
+            # If-Range: only resume when the client still has this version
+            if_range = request_headers.get("if-range")
+            if if_range is None or if_range == etag or if_range == headers["last-modified"]:
+                try:
+                    byte_range = parse_range(request_headers["range"], stat.st_size)
+                except RangeNotSatisfiable:
+                    byte_range = None
+                    status_code, self.count = 416, 0
+                    headers["content-range"] = f"bytes */{stat.st_size}"
+                if byte_range is not None:
+                    start, end = byte_range
+                    status_code = 206
+                    self.offset, self.count = start, end - start + 1
+                    headers["content-range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        if status_code != 304:
+            self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if self.method == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # The zero-copy extension takes a file object, not a descriptor
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+                return
+            fd = f.fileno()
+            offset, remaining = self.offset, self.count
+            while remaining > 0:
+                chunk = await asyncio.to_thread(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
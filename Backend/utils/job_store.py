@@ -0,0 +1,486 @@
+# backend/utils/job_store.py
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Job statuses after which nothing else will happen to the job
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+class JobStore:
+    """
+    Shared job state: job fields, the ordered progress event log and the
+    cancellation flag. Every API worker and OCR worker process talks to the
+    same store, so an SSE or DELETE request can land on a different process
+    than the one that accepted the upload.
+    """
+
+    def create_job(self, job_id, **fields):
+        raise NotImplementedError
+
+    def update_job(self, job_id, **fields):
+        raise NotImplementedError
+
+    def get_job(self, job_id):
+        """Return the job's fields as a dict, or None if it does not exist."""
+        raise NotImplementedError
+
+    def get_jobs(self, job_ids):
+        """Return {job_id: fields or None} for many jobs at once."""
+        return {job_id: self.get_job(job_id) for job_id in job_ids}
+
+    def append_event(self, job_id, message):
+        """Append a progress message and return its sequence number (1-based)."""
+        raise NotImplementedError
+
+    def read_events(self, job_id, after=0):
+        """Return [(seq, message), ...] for events with seq > after."""
+        raise NotImplementedError
+
+    def request_cancel(self, job_id):
+        """Flag a job for cancellation. Returns False if it is unknown or finished."""
+        job = self.get_job(job_id)
+        if job is None or job.get("status") in TERMINAL_STATUSES:
+            return False
+        self.update_job(job_id, cancel_requested=True)
+        return True
+
+    def is_cancel_requested(self, job_id):
+        job = self.get_job(job_id)
+        return bool(job and job.get("cancel_requested"))
+
+    def client_connected(self, job_id, delta):
+        """Adjust the job's connected SSE client count and return the new value."""
+        raise NotImplementedError
+
+    def add_stats(self, name, counters, **fields):
+        """Add to the integer counters of a shared stats record and set its other fields."""
+        raise NotImplementedError
+
+    def get_stats(self, name):
+        """Return a stats record as a dict ({} if nothing was recorded yet)."""
+        raise NotImplementedError
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store in a local SQLite file; works across processes on one machine.
+    WAL mode needs shared memory, so the file must not be on a network
+    filesystem; use Redis to share jobs between hosts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    sse_clients INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    message TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stats (
+                    name TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                )
+            """)
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def create_job(self, job_id, **fields):
+        now = time.time()
+        fields.setdefault("status", "queued")
+        fields.setdefault("created_at", now)
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (job_id, json.dumps(fields), now, now),
+        )
+
+    def update_job(self, job_id, **fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is not None:
+                data = json.loads(row[0])
+                data.update(fields)
+                conn.execute(
+                    "UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ?",
+                    (json.dumps(data), time.time(), job_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_job(self, job_id):
+        row = self._conn().execute(
+            "SELECT data, sse_clients FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        data["sse_clients"] = row[1]
+        return data
+
+    def get_jobs(self, job_ids):
+        jobs = dict.fromkeys(job_ids)
+        conn = self._conn()
+        ids = list(jobs)
+        # Stay under SQLite's host-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT job_id, data, sse_clients FROM jobs WHERE job_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for job_id, raw, sse_clients in rows:
+                data = json.loads(raw)
+                data["sse_clients"] = sse_clients
+                jobs[job_id] = data
+        return jobs
+
+    def append_event(self, job_id, message):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO events (job_id, seq, message, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, seq, message, time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    def read_events(self, job_id, after=0):
+        return self._conn().execute(
+            "SELECT seq, message FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after),
+        ).fetchall()
+
+    def client_connected(self, job_id, delta):
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET sse_clients = MAX(sse_clients + ?, 0) WHERE job_id = ?",
+            (delta, job_id),
+        )
+        row = conn.execute("SELECT sse_clients FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else 0
+
+    def add_stats(self, name, counters, **fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM stats WHERE name = ?", (name,)).fetchone()
+            data = json.loads(row[0]) if row else {}
+            for counter, amount in counters.items():
+                data[counter] = data.get(counter, 0) + amount
+            data.update(fields)
+            conn.execute(
+                "INSERT OR REPLACE INTO stats (name, data) VALUES (?, ?)", (name, json.dumps(data))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_stats(self, name):
+        row = self._conn().execute("SELECT data FROM stats WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+class RedisJobStore(JobStore):
+    """
+    Job store on a Redis-compatible client. Only hset/hget/hgetall/hincrby,
+    rpush/lrange and expire are used, so LocalRedis below (or any server
+    speaking the same commands) can stand in for a real Redis.
+    """
+
+    def __init__(self, client, prefix="arcflow", ttl_seconds=None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("JOB_TTL_SECONDS", "86400"))
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def _events_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}:events"
+
+    # Every job field is its own hash field holding a JSON value, so writers
+    # touching different fields (a worker's status, the API's cancel flag)
+    # never overwrite each other. sse_clients is a plain counter.
+
+    def _decode(self, raw):
+        if not raw:
+            return None
+        data = {field: json.loads(value) for field, value in raw.items() if field != "sse_clients"}
+        data["sse_clients"] = int(raw.get("sse_clients", 0))
+        return data
+
+    def create_job(self, job_id, **fields):
+        fields.setdefault("status", "queued")
+        fields.setdefault("created_at", time.time())
+        key = self._job_key(job_id)
+        mapping = {field: json.dumps(value) for field, value in fields.items()}
+        self.client.hset(key, mapping=dict(mapping, sse_clients=0))
+        self.client.expire(key, self.ttl_seconds)
+
+    def update_job(self, job_id, **fields):
+        key = self._job_key(job_id)
+        if not fields or self.client.hget(key, "status") is None:
+            return
+        self.client.hset(key, mapping={field: json.dumps(value) for field, value in fields.items()})
+
+    def get_job(self, job_id):
+        return self._decode(self.client.hgetall(self._job_key(job_id)))
+
+    def get_jobs(self, job_ids):
+        # One round trip with a real Redis client; LocalRedis has no pipelines
+        if not hasattr(self.client, "pipeline"):
+            return super().get_jobs(job_ids)
+        job_ids = list(dict.fromkeys(job_ids))
+        pipe = self.client.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(self._job_key(job_id))
+        return {job_id: self._decode(raw) for job_id, raw in zip(job_ids, pipe.execute())}
+
+    def append_event(self, job_id, message):
+        key = self._events_key(job_id)
+        seq = self.client.rpush(key, message)
+        self.client.expire(key, self.ttl_seconds)
+        return seq
+
+    def read_events(self, job_id, after=0):
+        messages = self.client.lrange(self._events_key(job_id), after, -1)
+        return [(after + i + 1, message) for i, message in enumerate(messages)]
+
+    def client_connected(self, job_id, delta):
+        key = self._job_key(job_id)
+        count = self.client.hincrby(key, "sse_clients", delta)
+        if count < 0:
+            # A release without a matching connect (e.g. after a restart):
+            # store 0, as SQLite does, so the next client counts as one
+            self.client.hincrby(key, "sse_clients", -count)
+            count = 0
+        return count
+
+    def _stats_key(self, name):
+        return f"{self.prefix}:stats:{name}"
+
+    def add_stats(self, name, counters, **fields):
+        key = self._stats_key(name)
+        for counter, amount in counters.items():
+            self.client.hincrby(key, counter, amount)
+        if fields:
+            self.client.hset(key, mapping={field: json.dumps(value) for field, value in fields.items()})
+
+    def get_stats(self, name):
+        # Counters are plain integers, which json.loads reads back as well
+        return {field: json.loads(value) for field, value in self.client.hgetall(self._stats_key(name)).items()}
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of Redis that RedisJobStore and
+    RedisTaskQueue need.
+    Only shared between threads of one process; use it for development
+    and tests, not for multiple workers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key, default):
+        """The value at key, or default (not stored) if it is missing or expired."""
+        expires = self._expiry.get(key)
+        if expires is not None and expires < time.time():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return self._data.get(key, default)
+
+    def _get_for_write(self, key, default):
+        """Like _get, but stores default first so writes to a new key stick."""
+        value = self._get(key, None)
+        if value is None:
+            value = self._data[key] = default
+        return value
+
+    def _drop_if_empty(self, key):
+        # Redis removes hashes, lists and sorted sets once they are empty
+        if not self._data.get(key, True):
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def hset(self, key, mapping):
+        with self._lock:
+            self._get_for_write(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._get(key, {}).get(field)
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._get(key, {}))
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            h = self._get_for_write(key, {})
+            h[field] = str(int(h.get(field, 0)) + amount)
+            return int(h[field])
+
+    def rpush(self, key, *values):
+        with self._lock:
+            lst = self._get_for_write(key, [])
+            lst.extend(values)
+            return len(lst)
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            lst = self._get(key, [])
+            return list(lst[start:] if end == -1 else lst[start:end + 1])
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            h = self._get(key, {})
+            removed = sum(h.pop(field, None) is not None for field in fields)
+            self._drop_if_empty(key)
+            return removed
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+
+    # Sorted sets, as {member: score}
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            z = self._get_for_write(key, {})
+            added = sum(member not in z for member in mapping)
+            z.update({member: float(score) for member, score in mapping.items()})
+            return added
+
+    def zincrby(self, key, amount, member):
+        with self._lock:
+            z = self._get_for_write(key, {})
+            z[member] = z.get(member, 0.0) + amount
+            return z[member]
+
+    def zrem(self, key, *members):
+        with self._lock:
+            z = self._get(key, {})
+            removed = sum(z.pop(member, None) is not None for member in members)
+            self._drop_if_empty(key)
+            return removed
+
+    def _zsorted(self, key):
+        return sorted(self._get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, key, start, end, withscores=False):
+        with self._lock:
+            items = self._zsorted(key)
+            items = items[start:] if end == -1 else items[start:end + 1]
+            return items if withscores else [member for member, _ in items]
+
+    def zrangebyscore(self, key, min, max, start=None, num=None):
+        low = float(min)
+        high = float(max)
+        with self._lock:
+            members = [member for member, score in self._zsorted(key) if low <= score <= high]
+        if start is not None:
+            members = members[start:start + num]
+        return members
+
+    def expire(self, key, seconds):
+        with self._lock:
+            # Like Redis, a missing key gets no expiry
+            if key in self._data:
+                self._expiry[key] = time.time() + seconds
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        """A lock shared by the threads of this process (redis-py's Lock spans processes)."""
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+class CancelToken:
+    """
+    threading.Event look-alike backed by the job store, so a DELETE handled
+    by any API worker reaches the thread running the job. The store is
+    polled at most every `poll_interval` seconds.
+    """
+
+    def __init__(self, store, job_id, poll_interval=0.5):
+        self.store = store
+        self.job_id = job_id
+        self.poll_interval = poll_interval
+        self._event = threading.Event()
+        self._last_poll = 0.0
+
+    def set(self):
+        self._event.set()
+
+    def is_set(self):
+        if self._event.is_set():
+            return True
+        now = time.monotonic()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            if self.store.is_cancel_requested(self.job_id):
+                self._event.set()
+        return self._event.is_set()
+
+def create_job_store(url=None):
+    """
+    Build the job store named by JOB_STORE_URL:
+      sqlite:///path/to/jobs.db  (default, next to main.py)
+      redis://host:port/0        (needs the `redis` package)
+      memory://                  (LocalRedis, single process only)
+    """
+    url = url or os.environ.get("JOB_STORE_URL") or "sqlite:///" + os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "jobs.db"
+    )
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("JOB_STORE_URL is a redis:// URL but the `redis` package is not installed")
+        return RedisJobStore(redis.Redis.from_url(url, decode_responses=True))
+    if url.startswith("memory://"):
+        return RedisJobStore(LocalRedis())
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
@@ -0,0 +1,146 @@
+# backend/utils/ocr_store.py
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class OCRStore:
+    """
+    Per-receipt OCR results in SQLite: the winning OCR text, every candidate
+    date and the image the document was built from, keyed by (job_id, seq).
+    The text is full-text indexed (FTS5 when SQLite has it, LIKE otherwise)
+    so receipts can be searched, and a finished job can be regrouped into a
+    new document without running Tesseract again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS receipts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                image_path TEXT NOT NULL,
+                date TEXT NOT NULL,
+                source TEXT,
+                text TEXT NOT NULL DEFAULT '',
+                candidates TEXT NOT NULL DEFAULT '[]',
+                created_at REAL NOT NULL,
+                UNIQUE (job_id, seq)
+            )
+        """)
+        try:
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS receipts_fts
+                USING fts5(text, filename, content='receipts', content_rowid='id')
+            """)
+            self.fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite has no FTS5; OCR text search falls back to LIKE")
+            self.fts = False
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def save(self, job_id, seq, filename, image_path, date, text="", candidates=(), source=None):
+        """Store (or replace, on a retried task) one receipt's OCR result."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute(
+                "SELECT id, text, filename FROM receipts WHERE job_id = ? AND seq = ?", (job_id, seq)
+            ).fetchone()
+            if old is not None:
+                if self.fts:
+                    conn.execute(
+                        "INSERT INTO receipts_fts (receipts_fts, rowid, text, filename) VALUES ('delete', ?, ?, ?)",
+                        (old["id"], old["text"], old["filename"]),
+                    )
+                conn.execute("DELETE FROM receipts WHERE id = ?", (old["id"],))
+            cur = conn.execute(
+                """INSERT INTO receipts (job_id, seq, filename, image_path, date, source, text, candidates, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, seq, filename, image_path, date, source, text or "", json.dumps(list(candidates)), time.time()),
+            )
+            if self.fts:
+                conn.execute(
+                    "INSERT INTO receipts_fts (rowid, text, filename) VALUES (?, ?, ?)",
+                    (cur.lastrowid, text or "", filename),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _decode(self, row):
+        receipt = dict(row)
+        receipt.pop("id", None)
+        receipt["candidates"] = json.loads(receipt["candidates"])
+        return receipt
+
+    def get_job_receipts(self, job_id):
+        """All stored receipts of a job in upload order."""
+        rows = self._conn().execute(
+            "SELECT * FROM receipts WHERE job_id = ? ORDER BY seq", (job_id,)
+        ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def search(self, query, limit=50, job_id=None):
+        """
+        Receipts whose OCR text or filename matches `query`, best match
+        first, each with a short highlighted snippet (FTS5 syntax such as
+        "coffee OR tea" works when FTS5 is available).
+        """
+        conn = self._conn()
+        job_filter = " AND r.job_id = ?" if job_id else ""
+        params = [job_id] if job_id else []
+        if self.fts:
+            sql = f"""SELECT r.*, snippet(receipts_fts, 0, '[', ']', '…', 12) AS snippet
+                      FROM receipts_fts JOIN receipts r ON r.id = receipts_fts.rowid
+                      WHERE receipts_fts MATCH ?{job_filter}
+                      ORDER BY rank LIMIT ?"""
+            try:
+                rows = conn.execute(sql, [query, *params, limit]).fetchall()
+            except sqlite3.OperationalError:
+                # Not valid FTS5 query syntax: search for it as a phrase
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = conn.execute(sql, [phrase, *params, limit]).fetchall()
+            return [self._decode(row) for row in rows]
+
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = conn.execute(
+            f"""SELECT r.* FROM receipts r
+                WHERE (r.text LIKE ? ESCAPE '\\' OR r.filename LIKE ? ESCAPE '\\'){job_filter}
+                ORDER BY r.created_at DESC LIMIT ?""",
+            [pattern, pattern, *params, limit],
+        ).fetchall()
+        results = []
+        for row in rows:
+            receipt = self._decode(row)
+            at = receipt["text"].lower().find(query.lower())
+            receipt["snippet"] = receipt["text"][max(at - 40, 0):at + len(query) + 40].strip() if at >= 0 else ""
+            results.append(receipt)
+        return results
+
+def create_ocr_store(path=None):
+    """Open the OCR text store at OCR_STORE_PATH (default: ocr_text.db next to main.py)."""
+    path = path or os.environ.get("OCR_STORE_PATH") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "ocr_text.db"
+    )
+    return OCRStore(path)
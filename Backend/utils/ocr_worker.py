@@ -0,0 +1,437 @@
+# backend/utils/ocr_worker.py
+import os
+import time
+import shutil
+import socket
+import threading
+import logging
+from uuid import uuid4
+
+from utils.receipt_sorter import (
+    extract_date_details,
+    find_dates_in_text,
+    candidate_summary,
+    create_receipt_document,
+    group_label,
+    group_sort_key,
+    JobCancelled,
+    check_cancelled,
+    CONFIG,
+)
+from utils.job_store import CancelToken
+from utils.pages import page_label, page_text, rasterize_page, PAGE_OCR_DPI, PAGE_THUMB_DPI
+from utils.date_hints import find_hints, hint_window, hint_report, DATE_HINT_MODES, DATE_HINT_EXTRA_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed task stays invisible to other workers without a heartbeat
+LEASE_SECONDS = float(os.environ.get("TASK_LEASE_SECONDS", "60"))
+
+# Delay before a failed task is retried
+RETRY_DELAY_SECONDS = float(os.environ.get("TASK_RETRY_DELAY_SECONDS", "5"))
+
+# How long a worker may build a document without renewing its claim before
+# another worker takes the job over
+FINALIZE_LEASE_SECONDS = float(os.environ.get("FINALIZE_LEASE_SECONDS", "120"))
+
+# Keep a finished job's uploads and thumbnails (until the retention sweeper
+# removes them) so it can be regrouped from the OCR store without re-upload.
+# Off by default: it keeps users' receipt images on disk after the job.
+KEEP_JOB_INPUTS = os.environ.get("KEEP_JOB_INPUTS", "0").lower() in ("1", "true", "yes")
+
+def new_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+
+def _keep_lease(queue, task, worker_id, done):
+    """Heartbeat thread: extend the task's lease until `done` is set."""
+    while not done.wait(LEASE_SECONDS / 3):
+        queue.extend_lease(task["task_id"], worker_id, LEASE_SECONDS)
+
+def _ocr_result(details, image_path, source):
+    """Task result from extract_date_details(); text and candidates go to the OCR store."""
+    return {
+        "date": details["date"],
+        "image_path": image_path,
+        "source": source,
+        "confidence": details["confidence"],
+        "match_type": details["match_type"],
+        "variant": details["variant"],
+        "config": details["config"],
+        "attempts": details["attempts"],
+        "ocr_seconds": details["ocr_seconds"],
+        "text": details["text"],
+        "candidates": details["candidates"],
+    }
+
+def _keep_finalize_lease(queue, job_id, worker_id, done):
+    """Heartbeat thread: renew a finalization claim until `done` is set."""
+    while not done.wait(FINALIZE_LEASE_SECONDS / 3):
+        queue.extend_finalize(job_id, worker_id)
+
+def _hint_result(hint, image_path):
+    """Task result for a receipt dated by an accepted hint, without OCR."""
+    return {
+        "date": hint["date"].strftime("%B %d, %Y"),
+        "image_path": image_path,
+        "source": f"hint_{hint['source']}",
+        "confidence": "hint",
+        "match_type": hint["source"],
+        "attempts": 0,
+        "ocr_seconds": 0.0,
+        "text": "",
+        "candidates": [],
+    }
+
+def run_ocr(task, cancel_event=None):
+    """
+    Date one task. Enabled date hints (utils.date_hints) are read first: an
+    "accept" hint dates the receipt without OCR, a "narrow" one steers the
+    OCR search. Pages of PDFs / multi-frame TIFFs are rasterized only now,
+    and a PDF page whose text layer already holds a date skips OCR.
+    Returns the task result: {"date", "image_path", "source", "hint",
+    "hints_found", ...} plus the OCR "text" and "candidates", which
+    process_task() moves to the OCR store.
+    """
+    hints = find_hints(task["image_path"], task["payload"].get("page")) if DATE_HINT_MODES else []
+    # Every source that had a hint, including ones not used for the date
+    return dict(_date_task(task, hints, cancel_event), hints_found=[h["source"] for h in hints])
+
+def _narrowed_ocr(image_path, window, hint_info, cancel_event):
+    """OCR steered by a narrow hint (if any), recording what it agreed with and cost."""
+    details = extract_date_details(
+        image_path, cancel_event=cancel_event, hint_window=window, hint_extra_attempts=DATE_HINT_EXTRA_ATTEMPTS,
+    )
+    if hint_info:
+        hint_info = dict(
+            hint_info,
+            agreed=details["hint_agreed"],
+            extra_attempts=details["hint_extra_attempts"],
+            extra_seconds=details["hint_extra_seconds"],
+        )
+    return dict(_ocr_result(details, image_path, "ocr"), hint=hint_info)
+
+def _date_task(task, hints, cancel_event=None):
+    """run_ocr() for a task whose date hints have been read."""
+    image_path = task["image_path"]
+    page = task["payload"].get("page")
+
+    accepted = next((h for h in hints if h["mode"] == "accept"), None)
+    narrowing = next((h for h in hints if h["mode"] == "narrow"), None)
+    hint = accepted or narrowing
+    hint_info = hint and {"source": hint["source"], "mode": hint["mode"], "date": hint["date"].strftime("%B %d, %Y")}
+    window = hint_window(narrowing) if narrowing else None
+
+    if accepted:
+        # Only a thumbnail is needed, so render at document resolution
+        if page is not None:
+            image_path = rasterize_page(image_path, page, dpi=PAGE_THUMB_DPI)
+        return dict(_hint_result(accepted, image_path), hint=hint_info)
+
+    if page is None:
+        return _narrowed_ocr(image_path, window, hint_info, cancel_event)
+
+    label = page_label(image_path, task["payload"])
+    text = page_text(image_path, page)
+    if text.strip():
+        found_dates = find_dates_in_text(text, f"{label}-text_layer")
+        if found_dates:
+            # Only a thumbnail is needed, so render at document resolution
+            page_image = rasterize_page(image_path, page, dpi=PAGE_THUMB_DPI)
+            best = found_dates[0]
+            agreed = False
+            if window is not None:
+                in_window = [fd for fd in found_dates if window[0] <= fd["date"] <= window[1]]
+                if in_window:
+                    best, agreed = in_window[0], True
+            return {
+                "date": best["date"].strftime("%B %d, %Y"),
+                "image_path": page_image,
+                "source": "text_layer",
+                "confidence": best["confidence"],
+                "match_type": best["type"],
+                "text": text,
+                "candidates": candidate_summary(found_dates),
+                "hint": hint_info and dict(hint_info, agreed=agreed),
+            }
+
+    check_cancelled(cancel_event)
+    page_image = rasterize_page(image_path, page, dpi=PAGE_OCR_DPI)
+    return _narrowed_ocr(page_image, window, hint_info, cancel_event)
+
+def process_task(task, queue, job_store, worker_id, ocr_store=None):
+    """
+    Run OCR for one claimed task and write the result back. The OCR text
+    and candidate dates go to ocr_store, if given. The job is finalized
+    here if this was its last unfinished task.
+    """
+    job_id = task["job_id"]
+    progress = queue.get_job(job_id) or {}
+    # Named relative to the job's upload folder, as in /jobs/{job_id}/results
+    filename = page_label(task["image_path"], task["payload"], progress.get("upload_dir") or progress.get("job_tmp_dir"))
+
+    job = job_store.get_job(job_id)
+    if job is not None and job.get("status") == "queued":
+        job_store.update_job(job_id, status="running")
+
+    cancel_event = CancelToken(job_store, job_id)
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_keep_lease, args=(queue, task, worker_id, done))
+    heartbeat.daemon = True
+    heartbeat.start()
+
+    try:
+        check_cancelled(cancel_event)
+        job_store.append_event(job_id, f"⏳ Processing {filename}...")
+        logger.info(f"[Job {job_id}] Processing: {filename} (attempt {task['attempts']})")
+
+        task_start = time.perf_counter()
+        result = run_ocr(task, cancel_event)
+        # Wall time for the whole task: rasterizing, preprocessing and OCR
+        result["seconds"] = round(time.perf_counter() - task_start, 3)
+        text = result.pop("text", "")
+        candidates = result.pop("candidates", [])
+        date_str = result["date"]
+
+        if ocr_store is not None:
+            try:
+                ocr_store.save(
+                    job_id, task["seq"], filename, result["image_path"], date_str,
+                    text=text, candidates=candidates, source=result["source"],
+                )
+            except Exception as e:
+                # Search / regroup lose this receipt, the job itself is unaffected
+                logger.warning(f"[Job {job_id}] Could not store OCR text for {filename}: {e}")
+
+        if queue.complete(task["task_id"], worker_id, result):
+            progress = queue.get_job(job_id)
+            total = progress["total_tasks"] or progress["enqueued"]
+            percentage = int((progress["finished"] / total) * 100)
+            job_store.append_event(job_id, f"✅ [{percentage}%] {filename} → {date_str}")
+            logger.info(f"[Job {job_id}] Assigned '{date_str}' to {filename}")
+
+    except JobCancelled:
+        queue.cancel_task(task["task_id"])
+        queue.cancel_job(job_id)
+
+    except Exception as e:
+        logger.error(f"[Job {job_id}] Error processing {task['image_path']}: {e}")
+        status = queue.fail(task["task_id"], worker_id, e, retry_delay=RETRY_DELAY_SECONDS)
+        if status == "failed":
+            # Clients see the error without the server's directory layout
+            message = str(e).replace(os.path.dirname(task["image_path"]) + os.sep, "")
+            job_store.append_event(job_id, f"❌ Error processing {filename}: {message}")
+            if ocr_store is not None:
+                # Keep the receipt in the store undated, so the job can
+                # still be regrouped with every one of its receipts
+                try:
+                    ocr_store.save(job_id, task["seq"], filename, task["image_path"], "Unknown Date")
+                except Exception as store_error:
+                    logger.warning(f"[Job {job_id}] Could not store failed receipt {filename}: {store_error}")
+
+    finally:
+        done.set()
+
+    if queue.claim_finalize(job_id, worker_id):
+        finalize_job(job_id, queue, job_store, worker_id)
+
+def finalize_ready_jobs(queue, job_store, worker_id=None):
+    """
+    Finalize every sealed job whose tasks have all finished but which no
+    worker has claimed: jobs whose last task finished before the upload
+    was sealed, jobs without tasks, and jobs whose finalizer died.
+    """
+    for job_id in queue.finalizable_jobs():
+        if queue.claim_finalize(job_id, worker_id):
+            finalize_job(job_id, queue, job_store, worker_id)
+
+def write_document(job_id, job_store, receipts_by_date, output_doc, tier, temp_folder, cancel_event=None):
+    """
+    Build and save the Word document for `receipts_by_date`, reporting size
+    and summary to the job's event log. Returns the job fields to record.
+    """
+    send_progress = job_store.append_event
+
+    # Send document generation status
+    send_progress(job_id, f"📄 Creating Word document with {len(receipts_by_date)} date groups...")
+
+    logger.info(f"[Job {job_id}] Creating Word document...")
+    encode_start = time.perf_counter()
+    doc = create_receipt_document(
+        receipts_by_date,
+        cancel_event=cancel_event,
+        temp_folder=temp_folder,
+        tier=tier,
+    )
+    check_cancelled(cancel_event)
+
+    # Save document
+    doc.save(output_doc)
+    encode_seconds = round(time.perf_counter() - encode_start, 3)
+    output_bytes = os.path.getsize(output_doc)
+    logger.info(f"[Job {job_id}] Saved Word doc to: {output_doc} ({output_bytes} bytes, {tier}, {encode_seconds}s)")
+    send_progress(job_id, f"📦 Document size: {output_bytes / (1024 * 1024):.1f} MB ({tier} tier, encoded in {encode_seconds:.1f}s)")
+
+    # Send summary
+    groups = sorted(receipts_by_date.items(), key=lambda item: group_sort_key(item[0]))
+    summary_lines = [f"  • {date}: {len(files)} receipt(s)" for date, files in groups]
+    send_progress(job_id, f"📊 Summary:\n" + "\n".join(summary_lines))
+
+    return {
+        "output_path": output_doc,
+        "download_url": f"/download/{os.path.basename(output_doc)}",
+        "tier": tier,
+        "output_bytes": output_bytes,
+        "encode_seconds": encode_seconds,
+    }
+
+def _announce_document(job_id, job_store, output_doc):
+    """Final events of a job whose document has been written."""
+    download_filename = os.path.basename(output_doc)
+    job_store.append_event(job_id, f"✅ Word document saved as '{download_filename}'")
+    job_store.append_event(job_id, f"🎉 Processing complete! Ready for download.")
+
+def finalize_job(job_id, queue, job_store, worker_id=None):
+    """
+    Build and save the Word document from a job's task results, or release
+    the job's files if it was cancelled. Call only after claim_finalize()
+    with the same worker_id; the claim is renewed while this runs.
+    """
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_keep_finalize_lease, args=(queue, job_id, worker_id, done))
+    heartbeat.daemon = True
+    heartbeat.start()
+    try:
+        _finalize_job(job_id, queue, job_store)
+    finally:
+        done.set()
+        queue.finish_finalize(job_id)
+
+def _finalize_job(job_id, queue, job_store):
+    job = queue.get_job(job_id)
+    output_doc = job["output_path"]
+    job_tmp_dir = job["job_tmp_dir"]
+    cancel_event = CancelToken(job_store, job_id)
+    send_progress = job_store.append_event
+
+    try:
+        check_cancelled(cancel_event)
+        if job["counts"].get("cancelled"):
+            raise JobCancelled()
+
+        # Organize by date (or week / month for a regrouped job), keeping
+        # upload order within each group; weeks and months list their
+        # receipts by date first
+        group_by = job.get("group_by", "day")
+        tasks = queue.get_tasks(job_id)
+        if group_by != "day":
+            tasks.sort(key=lambda task: (group_sort_key((task["result"] or {}).get("date", "Unknown Date")), task["seq"]))
+        receipts_by_date = {}
+        for task in tasks:
+            result = task["result"] or {}
+            date_str = group_label(result.get("date", "Unknown Date"), group_by)
+            # Pages of a PDF / TIFF each become their own receipt
+            image_path = result.get("image_path")
+            if image_path is None and "page" in task["payload"]:
+                try:
+                    image_path = rasterize_page(task["image_path"], task["payload"]["page"], dpi=PAGE_THUMB_DPI)
+                except Exception as e:
+                    # The document shows an "Error loading" cell for this page instead
+                    logger.error(f"[Job {job_id}] Could not render {page_label(task['image_path'], task['payload'])}: {e}")
+            receipts_by_date.setdefault(date_str, []).append(image_path or task["image_path"])
+
+        # How many receipts the date hints dated or confirmed, and the OCR
+        # they saved (a regrouped job ran no OCR of its own)
+        hints = None
+        if DATE_HINT_MODES and not job.get("regroup_of"):
+            hints = hint_report([task["result"] for task in tasks])
+            saved = f", ~{hints['ocr_seconds_saved']:.1f}s OCR saved" if hints["ocr_seconds_saved"] is not None else ""
+            saved += f", {hints['narrow_seconds_added']:.1f}s OCR added by narrowing" if hints["narrowed"] else ""
+            by_source = ", ".join(f"{source} {n}" for source, n in hints["by_source"].items()) or "none"
+            send_progress(
+                job_id,
+                f"🔎 Date hints: {hints['with_hint']}/{hints['receipts']} receipts ({by_source}); "
+                f"{hints['accepted']} accepted without OCR{saved}, {hints['agreed']}/{hints['narrowed']} confirmed by OCR",
+            )
+
+        tier = job.get("tier") or CONFIG['OUTPUT_TIER']
+        fields = write_document(
+            job_id, job_store, receipts_by_date, output_doc, tier,
+            # A regrouped job reuses the thumbnails of the job it came from
+            temp_folder=job.get("thumb_dir") or os.path.join(job_tmp_dir, "processed"),
+            cancel_event=cancel_event,
+        )
+
+        # Cleanup job temp directory (uploads and processed thumbnails),
+        # unless it is kept for regrouping
+        if not KEEP_JOB_INPUTS:
+            shutil.rmtree(job_tmp_dir, ignore_errors=True)
+
+        job_store.update_job(job_id, status="completed", finished_at=time.time(), hints=hints, **fields)
+
+        # Send completion with download info
+        _announce_document(job_id, job_store, output_doc)
+
+        logger.info(f"[Job {job_id}] ✅ Processing completed successfully")
+
+    except JobCancelled:
+        logger.info(f"[Job {job_id}] 🛑 Cancelled, releasing temp files")
+
+        # Release everything the job was holding right away
+        shutil.rmtree(job_tmp_dir, ignore_errors=True)
+        if os.path.exists(output_doc):
+            os.remove(output_doc)
+        job_store.update_job(job_id, status="cancelled", finished_at=time.time())
+        send_progress(job_id, f"🛑 Processing cancelled")
+
+    except Exception as e:
+        logger.error(f"[Job {job_id}] Fatal error: {e}")
+        shutil.rmtree(job_tmp_dir, ignore_errors=True)
+        job_store.update_job(job_id, status="failed", finished_at=time.time(), error=str(e))
+        send_progress(job_id, f"❌ Processing failed: {str(e)}")
+
+def run_worker(queue, job_store, worker_id=None, stop_event=None, poll_interval=1.0, ocr_store=None):
+    """Claim and process tasks until stop_event is set."""
+    worker_id = worker_id or new_worker_id()
+    stop_event = stop_event or threading.Event()
+    logger.info(f"OCR worker {worker_id} started")
+    last_reap = last_finalize = 0.0
+
+    while not stop_event.is_set():
+        try:
+            # Periodically fail tasks whose worker died on the final attempt
+            # and release document builds whose worker died
+            if time.time() - last_reap > LEASE_SECONDS:
+                last_reap = time.time()
+                queue.reap_expired(FINALIZE_LEASE_SECONDS)
+
+            # Jobs that are complete but were never finalized by a task
+            if time.time() - last_finalize > poll_interval:
+                last_finalize = time.time()
+                finalize_ready_jobs(queue, job_store, worker_id)
+
+            task = queue.claim(worker_id, LEASE_SECONDS)
+            if task is None:
+                stop_event.wait(poll_interval)
+                continue
+            process_task(task, queue, job_store, worker_id, ocr_store)
+
+        except Exception as e:
+            logger.error(f"OCR worker {worker_id} error: {e}")
+            stop_event.wait(poll_interval)
+
+    logger.info(f"OCR worker {worker_id} stopped")
+
+def start_worker_threads(queue, job_store, count, stop_event=None, ocr_store=None):
+    """Start `count` worker threads in this process and return them."""
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(
+            target=run_worker,
+            args=(queue, job_store),
+            kwargs={"stop_event": stop_event, "ocr_store": ocr_store},
+            name=f"ocr-worker-{i}",
+        )
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    return threads
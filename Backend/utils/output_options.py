@@ -0,0 +1,43 @@
+# backend/utils/output_options.py
+import os
+from datetime import datetime, timedelta
+
+# Kept free of the OCR / imaging stack so the API can validate requests
+# without importing cv2, pytesseract or python-docx.
+
+# Output size tiers for thumbnails embedded in the Word document.
+# Thumbnails are always stored as JPEG; PNG screenshots no longer end up
+# as large lossless images in the .docx.
+OUTPUT_TIERS = {
+    'draft':    {'dpi': 96,  'quality': 60, 'grayscale': True},
+    'standard': {'dpi': 150, 'quality': 80, 'grayscale': False},
+    'print':    {'dpi': 300, 'quality': 92, 'grayscale': False},
+}
+
+# Tier used when a job doesn't ask for one
+DEFAULT_OUTPUT_TIER = os.environ.get("OUTPUT_TIER", "standard")
+
+# Ways a job's receipts can be grouped into document sections
+GROUP_BY_OPTIONS = ('day', 'week', 'month')
+
+def group_label(date_str, group_by='day'):
+    """Section heading for a receipt dated `date_str` ("March 14, 2025") under `group_by`."""
+    try:
+        date = datetime.strptime(date_str, "%B %d, %Y")
+    except ValueError:
+        return date_str
+    if group_by == 'week':
+        monday = date - timedelta(days=date.weekday())
+        return f"Week of {monday.strftime('%B %d, %Y')}"
+    if group_by == 'month':
+        return date.strftime("%B %Y")
+    return date_str
+
+def group_sort_key(label):
+    """Chronological order for group headings; Unknown Date and anything unparseable go last."""
+    for fmt in ("%B %d, %Y", "Week of %B %d, %Y", "%B %Y"):
+        try:
+            return (0, datetime.strptime(label, fmt), label)
+        except ValueError:
+            continue
+    return (1, datetime.max, label)
@@ -0,0 +1,99 @@
+# backend/utils/pages.py
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Inputs that hold several receipts, one per page / frame
+MULTIPAGE_EXTENSIONS = ('.pdf', '.tif', '.tiff')
+
+# Rasterization resolution for pages that need OCR, and for pages that
+# only need a thumbnail in the document (their date came from the text layer)
+PAGE_OCR_DPI = int(os.environ.get("PAGE_OCR_DPI", "300"))
+PAGE_THUMB_DPI = int(os.environ.get("PAGE_THUMB_DPI", "150"))
+
+def is_multipage(path):
+    return path.lower().endswith(MULTIPAGE_EXTENSIONS)
+
+def is_pdf(path):
+    return path.lower().endswith('.pdf')
+
+def _open_pdf(path):
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        raise RuntimeError("PDF input needs PyMuPDF (pip install pymupdf)")
+    return fitz.open(path)
+
+def count_pages(path):
+    """Number of pages / frames, read from the file structure without decoding pixels."""
+    if is_pdf(path):
+        with _open_pdf(path) as pdf:
+            return pdf.page_count
+    from PIL import Image
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+def expand_upload(path):
+    """
+    Split an uploaded file into OCR tasks: [(path, payload), ...].
+    Images are one task; PDFs and multi-frame TIFFs get one task per page,
+    rasterized later by whichever worker claims it. Files whose pages
+    cannot be counted stay a single task.
+    """
+    if not is_multipage(path):
+        return [(path, {})]
+    try:
+        pages = count_pages(path)
+    except Exception as e:
+        # A corrupt file must not fail the whole upload: queue it as a single
+        # task so the worker records it as a failed receipt
+        logger.warning(f"{os.path.basename(path)}: cannot read pages ({e}), queued as one receipt")
+        return [(path, {})]
+    logger.info(f"{os.path.basename(path)}: {pages} page(s)")
+    return [(path, {"page": page}) for page in range(pages)]
+
+def page_label(path, payload, root=None):
+    """
+    Human-readable name for progress messages: the path relative to root
+    (the job's upload folder) if given, so same-named files in different
+    folders stay apart, else the file name.
+    """
+    filename = os.path.relpath(path, root) if root else os.path.basename(path)
+    if "page" in payload:
+        return f"{filename} (page {payload['page'] + 1})"
+    return filename
+
+def page_text(path, page):
+    """Embedded text layer of a PDF page ('' for TIFF frames and scanned PDFs)."""
+    if not is_pdf(path):
+        return ""
+    with _open_pdf(path) as pdf:
+        return pdf[page].get_text()
+
+def pdf_metadata(path):
+    """Document info dict of a PDF (creationDate, producer, ...); {} for other files."""
+    if not is_pdf(path):
+        return {}
+    with _open_pdf(path) as pdf:
+        return pdf.metadata or {}
+
+def rasterize_page(path, page, dest_dir=None, dpi=PAGE_OCR_DPI):
+    """
+    Render one page / frame to a PNG and return its path. Pages go to a
+    pages/ folder next to the source unless dest_dir is given.
+    """
+    dest_dir = dest_dir or os.path.join(os.path.dirname(path), "pages")
+    os.makedirs(dest_dir, exist_ok=True)
+    out_path = os.path.join(dest_dir, f"{os.path.basename(path)}.p{page + 1}.png")
+
+    if is_pdf(path):
+        with _open_pdf(path) as pdf:
+            pdf[page].get_pixmap(dpi=dpi).save(out_path)
+    else:
+        from PIL import Image
+        with Image.open(path) as img:
+            img.seek(page)
+            frame = img.convert('RGB')
+            frame.save(out_path, dpi=(dpi, dpi))
+    return out_path
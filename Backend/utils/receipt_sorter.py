@@ -1,5 +1,8 @@
 import os
 import re
+import hashlib
+import json
+import time
 from PIL import Image, ImageOps, ImageEnhance, ImageFilter
 import pytesseract
 from docx import Document
@@ -7,6 +10,13 @@ from docx.shared import Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.shared import OxmlElement, qn
 from datetime import datetime
+from utils.output_options import (
+    OUTPUT_TIERS,
+    DEFAULT_OUTPUT_TIER,
+    GROUP_BY_OPTIONS,
+    group_label,
+    group_sort_key,
+)
 import logging
 import cv2
 import numpy as np
@@ -17,100 +27,174 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 CONFIG = {
-    'TESSERACT_PATH': r"C:\Users\divin\AppData\Local\Programs\Tesseract-OCR\tesseract.exe",
+    'TESSERACT_PATH': os.environ.get("TESSERACT_PATH", r"C:\Users\divin\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"),
     'INPUT_FOLDER': "receipts",
     'OUTPUT_DOC': "Receipts_Sorted.docx",
     'IMAGE_WIDTH': Inches(2.8),
     'IMAGE_HEIGHT': Inches(3.5),
     'PADDING_COLOR': (255, 255, 255),
-    'TEMP_FOLDER': "temp_processed"
+    'TEMP_FOLDER': "temp_processed",
+    'OUTPUT_TIER': DEFAULT_OUTPUT_TIER,
+    'OCR_STRATEGY_FILE': os.environ.get("OCR_STRATEGY_FILE")
 }
 
-pytesseract.pytesseract.tesseract_cmd = CONFIG['TESSERACT_PATH']
+# Fall back to `tesseract` on PATH when the configured binary isn't there (Linux deploys)
+if os.path.exists(CONFIG['TESSERACT_PATH']):
+    pytesseract.pytesseract.tesseract_cmd = CONFIG['TESSERACT_PATH']
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation token has been set."""
+
+def check_cancelled(cancel_event, context=""):
+    """Raise JobCancelled if the job's cancellation token is set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled(context or "Job cancelled")
 
 def create_temp_folder():
     """Create temporary folder for processed images."""
     if not os.path.exists(CONFIG['TEMP_FOLDER']):
         os.makedirs(CONFIG['TEMP_FOLDER'])
 
-def preprocess_for_ocr(image_path):
+def _load_grayscale(image_path):
+    """Read an image as a grayscale numpy array, falling back to PIL if OpenCV can't."""
+    img_cv = cv2.imread(image_path)
+    if img_cv is not None:
+        return cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+    with Image.open(image_path) as img:
+        return np.array(ImageOps.autocontrast(img.convert('L')))
+
+def _grayscale(gray):
+    # 1. Original grayscale
+    return Image.fromarray(gray)
+
+def _adaptive_thresh(gray):
+    # 2. Adaptive thresholding (great for uneven lighting)
+    return Image.fromarray(cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+    ))
+
+def _otsu(gray):
+    # 3. Otsu's thresholding (automatic optimal threshold)
+    _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(otsu)
+
+def _denoised_sharp(gray):
+    # 4. Denoising + sharpening
+    denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+    kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+    return Image.fromarray(cv2.filter2D(denoised, -1, kernel))
+
+def _high_contrast_sharp(gray):
+    # 5. High contrast + sharpening
+    high_contrast = ImageEnhance.Contrast(Image.fromarray(gray)).enhance(2.5)
+    return ImageEnhance.Sharpness(high_contrast).enhance(2.0)
+
+def _morphological(gray):
+    # 6. Morphological operations (remove noise, enhance text)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+    morph = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
+    _, morph_thresh = cv2.threshold(morph, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(morph_thresh)
+
+def _bilateral(gray):
+    # 7. Bilateral filter (preserve edges while reducing noise)
+    bilateral = cv2.bilateralFilter(gray, 9, 75, 75)
+    _, bilateral_thresh = cv2.threshold(bilateral, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(bilateral_thresh)
+
+def _upscaled(gray):
+    # 8. Increased size for better OCR (upscale by 2x)
+    height, width = gray.shape
+    upscaled = cv2.resize(gray, (width * 2, height * 2), interpolation=cv2.INTER_CUBIC)
+    _, upscaled_thresh = cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(upscaled_thresh)
+
+# Preprocessing variants, in the order they are tried by default
+PREPROCESS_VARIANTS = {
+    "grayscale": _grayscale,
+    "adaptive_thresh": _adaptive_thresh,
+    "otsu": _otsu,
+    "denoised_sharp": _denoised_sharp,
+    "high_contrast_sharp": _high_contrast_sharp,
+    "morphological": _morphological,
+    "bilateral": _bilateral,
+    "upscaled": _upscaled,
+}
+
+# OCR configurations, in the order they are tried by default
+OCR_CONFIGS = [
+    r'--oem 3 --psm 6',  # Uniform block of text
+    r'--oem 3 --psm 4',  # Single column
+    r'--oem 3 --psm 3',  # Fully automatic
+    r'--oem 3 --psm 11', # Sparse text
+    r'--oem 1 --psm 6',  # LSTM only
+]
+
+def full_strategy():
+    """Every preprocessing variant × OCR config, variant-major (the original search order)."""
+    return [(variant, config) for variant in PREPROCESS_VARIANTS for config in OCR_CONFIGS]
+
+def load_ocr_strategy(path):
+    """
+    Load an ordered [(variant, config), ...] list from a JSON file such as
+    the one written by `python -m utils.strategy_profiler`.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    strategy = [(variant, config) for variant, config in data["strategy"]]
+    for variant, config in strategy:
+        if variant not in PREPROCESS_VARIANTS:
+            raise ValueError(f"Unknown preprocessing variant '{variant}' in {path}")
+        if config not in OCR_CONFIGS:
+            raise ValueError(f"Unknown Tesseract config '{config}' in {path}")
+    if not strategy:
+        raise ValueError(f"Empty OCR strategy in {path}")
+    return strategy
+
+# Ordered (variant, config) pairs extract_date_from_image tries; prune it
+# with OCR_STRATEGY_FILE to skip combinations that never win on your data
+OCR_STRATEGY = load_ocr_strategy(CONFIG['OCR_STRATEGY_FILE']) if CONFIG['OCR_STRATEGY_FILE'] else full_strategy()
+
+def preprocess_for_ocr(image_path, variants=None):
     """
     Advanced image preprocessing for better OCR on low-quality images.
-    Returns list of preprocessed PIL Images to try.
+    Returns list of (name, PIL Image) for the requested variants (default all).
+    """
+    gray = _load_grayscale(image_path)
+    return [(name, PREPROCESS_VARIANTS[name](gray)) for name in (variants or PREPROCESS_VARIANTS)]
+
+def file_digest(path):
+    """SHA-1 of a file's bytes, used to spot duplicate uploads."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def process_image(image_path, target_width=CONFIG['IMAGE_WIDTH'], target_height=CONFIG['IMAGE_HEIGHT'], temp_folder=None, tier=None):
+    """
+    Process image to have consistent size with white padding.
+    DPI, JPEG quality and grayscale conversion come from the OUTPUT_TIERS
+    entry `tier`. The thumbnail is named after the source's content hash,
+    so byte-identical uploads are encoded once and share one file.
     """
-    preprocessed_images = []
+    tier = tier or CONFIG['OUTPUT_TIER']
+    settings = OUTPUT_TIERS[tier]
+    dpi = settings['dpi']
     
     try:
-        # Read image with OpenCV for advanced processing
-        img_cv = cv2.imread(image_path)
-        if img_cv is None:
-            # Fallback to PIL if OpenCV fails
-            return [Image.open(image_path)]
-        
-        # 1. Original grayscale
-        gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-        preprocessed_images.append(("grayscale", Image.fromarray(gray)))
-        
-        # 2. Adaptive thresholding (great for uneven lighting)
-        adaptive_thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
-        preprocessed_images.append(("adaptive_thresh", Image.fromarray(adaptive_thresh)))
-        
-        # 3. Otsu's thresholding (automatic optimal threshold)
-        _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append(("otsu", Image.fromarray(otsu)))
-        
-        # 4. Denoising + sharpening
-        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(denoised, -1, kernel)
-        preprocessed_images.append(("denoised_sharp", Image.fromarray(sharpened)))
-        
-        # 5. High contrast + sharpening
-        pil_img = Image.fromarray(gray)
-        contrast_enhancer = ImageEnhance.Contrast(pil_img)
-        high_contrast = contrast_enhancer.enhance(2.5)
-        sharpness_enhancer = ImageEnhance.Sharpness(high_contrast)
-        sharp = sharpness_enhancer.enhance(2.0)
-        preprocessed_images.append(("high_contrast_sharp", sharp))
-        
-        # 6. Morphological operations (remove noise, enhance text)
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-        morph = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-        _, morph_thresh = cv2.threshold(morph, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append(("morphological", Image.fromarray(morph_thresh)))
-        
-        # 7. Bilateral filter (preserve edges while reducing noise)
-        bilateral = cv2.bilateralFilter(gray, 9, 75, 75)
-        _, bilateral_thresh = cv2.threshold(bilateral, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append(("bilateral", Image.fromarray(bilateral_thresh)))
-        
-        # 8. Increased size for better OCR (upscale by 2x)
-        height, width = gray.shape
-        upscaled = cv2.resize(gray, (width * 2, height * 2), interpolation=cv2.INTER_CUBIC)
-        _, upscaled_thresh = cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append(("upscaled", Image.fromarray(upscaled_thresh)))
+        folder = temp_folder or CONFIG['TEMP_FOLDER']
+        processed_path = os.path.join(folder, f"processed_{file_digest(image_path)[:16]}_{tier}.jpg")
+        if os.path.exists(processed_path):
+            return processed_path
         
-    except Exception as e:
-        logger.warning(f"Error in advanced preprocessing: {e}, using basic preprocessing")
-        # Fallback to PIL-only preprocessing
-        with Image.open(image_path) as img:
-            preprocessed_images.append(("original", img.copy()))
-            preprocessed_images.append(("grayscale_pil", img.convert('L')))
-            preprocessed_images.append(("enhanced_pil", ImageOps.autocontrast(img.convert('L'))))
-    
-    return preprocessed_images
-
-def process_image(image_path, target_width=CONFIG['IMAGE_WIDTH'], target_height=CONFIG['IMAGE_HEIGHT']):
-    """Process image to have consistent size with white padding."""
-    try:
         with Image.open(image_path) as img:
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+            mode = 'L' if settings['grayscale'] else 'RGB'
+            if img.mode != mode:
+                img = img.convert(mode)
             
-            target_width_px = int(target_width.inches * 150)
-            target_height_px = int(target_height.inches * 150)
+            target_width_px = int(target_width.inches * dpi)
+            target_height_px = int(target_height.inches * dpi)
             
             img_ratio = img.width / img.height
             target_ratio = target_width_px / target_height_px
@@ -123,15 +207,14 @@ def process_image(image_path, target_width=CONFIG['IMAGE_WIDTH'], target_height=
                 new_width = int(target_height_px * img_ratio)
             
             img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            new_img = Image.new('RGB', (target_width_px, target_height_px), CONFIG['PADDING_COLOR'])
+            padding = 255 if mode == 'L' else CONFIG['PADDING_COLOR']
+            new_img = Image.new(mode, (target_width_px, target_height_px), padding)
             
             x = (target_width_px - new_width) // 2
             y = (target_height_px - new_height) // 2
             new_img.paste(img_resized, (x, y))
             
-            filename = os.path.basename(image_path)
-            processed_path = os.path.join(CONFIG['TEMP_FOLDER'], f"processed_{filename}")
-            new_img.save(processed_path, quality=95, dpi=(150, 150))
+            new_img.save(processed_path, 'JPEG', quality=settings['quality'], optimize=True, dpi=(dpi, dpi))
             
             return processed_path
             
@@ -200,10 +283,10 @@ def parse_date_strict(date_string):
     
     return None
 
-def extract_date_from_text(text, debug_filename=""):
+def find_dates_in_text(text, debug_filename=""):
     """
-    Extract date from text using strict pattern matching.
-    Returns the most reliable date found.
+    Find every valid date in text using strict pattern matching.
+    Returns candidate dicts (date, match, confidence, type), most reliable first.
     """
     text = re.sub(r'\s+', ' ', text.strip())
     
@@ -286,13 +369,21 @@ def extract_date_from_text(text, debug_filename=""):
         for fd in found_dates:
             logger.info(f"  - '{fd['match']}' -> {fd['date'].strftime('%B %d, %Y')} (confidence: {fd['confidence']}, type: {fd['type']})")
     
-    if not found_dates:
-        logger.warning(f"[{debug_filename}] ❌ No valid dates found")
-        return "Unknown Date"
-    
     # Prioritize dates by confidence level
     confidence_order = {'very_high': 0, 'high': 1, 'medium': 2, 'low': 3}
     found_dates.sort(key=lambda x: (confidence_order.get(x['confidence'], 4), text.index(x['match'])))
+    return found_dates
+
+def extract_date_from_text(text, debug_filename=""):
+    """
+    Extract date from text using strict pattern matching.
+    Returns the most reliable date found.
+    """
+    found_dates = find_dates_in_text(text, debug_filename)
+    
+    if not found_dates:
+        logger.warning(f"[{debug_filename}] ❌ No valid dates found")
+        return "Unknown Date"
     
     best_date = found_dates[0]
     result = best_date['date'].strftime("%B %d, %Y")
@@ -301,53 +392,135 @@ def extract_date_from_text(text, debug_filename=""):
     
     return result
 
-def extract_date_from_image(image_path):
-    """Extract date from receipt image using OCR with advanced preprocessing."""
+def candidate_summary(found_dates):
+    """JSON-friendly form of find_dates_in_text() results."""
+    return [
+        {
+            'date': fd['date'].strftime("%B %d, %Y"),
+            'match': fd['match'],
+            'confidence': fd['confidence'],
+            'type': fd['type'],
+        }
+        for fd in found_dates
+    ]
+
+def extract_date_details(image_path, cancel_event=None, strategy=None, hint_window=None, hint_extra_attempts=None):
+    """
+    Extract date from receipt image using OCR with advanced preprocessing.
+    Tries the (variant, config) pairs of `strategy` (default OCR_STRATEGY)
+    in order; each preprocessing variant is only built once it is needed.
+    If cancel_event is given it is checked between OCR attempts and
+    JobCancelled is raised as soon as it is set.
+    
+    With hint_window=(start, end) (see utils.date_hints) the search stops
+    at the first candidate date inside the window, even one ranked below
+    other candidates; if no attempt finds one, the date the search would
+    have picked without the hint is returned. Once a date outside the
+    window has been found, at most hint_extra_attempts more attempts are
+    made (default: no limit).
+    
+    Returns a dict: date, confidence, match_type, candidates, text (the
+    winning OCR text, or all text combined), variant, config, attempts,
+    ocr_seconds, hint_agreed, and the attempts / seconds spent after the
+    first date was found (hint_extra_attempts, hint_extra_seconds).
+    """
     filename = os.path.basename(image_path)
+    strategy = strategy or OCR_STRATEGY
+    start = time.perf_counter()
+    details = {
+        'date': "Unknown Date", 'confidence': None, 'match_type': None, 'candidates': [],
+        'text': "", 'variant': None, 'config': None, 'attempts': 0, 'ocr_seconds': 0.0,
+        'hint_agreed': False, 'hint_extra_attempts': 0, 'hint_extra_seconds': 0.0,
+    }
+    
+    def pick(found_dates):
+        """The candidate to use: first one inside the hint window, else the best one."""
+        if hint_window is not None:
+            for fd in found_dates:
+                if hint_window[0] <= fd['date'] <= hint_window[1]:
+                    return fd, True
+        return found_dates[0], False
+    
+    def chosen(found_dates, best, agreed, **fields):
+        return dict(
+            date=best['date'].strftime("%B %d, %Y"), confidence=best['confidence'],
+            match_type=best['type'], candidates=candidate_summary(found_dates), hint_agreed=agreed, **fields,
+        )
+    
+    # Without a hint the first date found wins; with one, it is the fallback
+    first_found = None
+    first_found_at = None
     
     try:
-        # OCR configurations to try
-        configs = [
-            r'--oem 3 --psm 6',  # Uniform block of text
-            r'--oem 3 --psm 4',  # Single column
-            r'--oem 3 --psm 3',  # Fully automatic
-            r'--oem 3 --psm 11', # Sparse text
-            r'--oem 1 --psm 6',  # LSTM only
-        ]
-        
         all_text = ""
-        
-        # Get preprocessed images
-        preprocessed_images = preprocess_for_ocr(image_path)
-        
-        logger.info(f"[{filename}] Testing {len(preprocessed_images)} preprocessing methods × {len(configs)} OCR configs = {len(preprocessed_images) * len(configs)} combinations")
-        
-        # Try each preprocessed image with each config
-        for img_name, img_variant in preprocessed_images:
-            for config_idx, config in enumerate(configs):
-                try:
-                    text = pytesseract.image_to_string(img_variant, config=config)
-                    all_text += " " + text
-                    
-                    logger.info(f"[{filename}] OCR ({img_name}-config{config_idx}): {text[:100].strip()}...")
+        gray = _load_grayscale(image_path)
+        variants = {}
+        
+        logger.info(f"[{filename}] Testing up to {len(strategy)} preprocessing × OCR config combinations")
+        
+        # Try each preprocessed image with its config
+        for img_name, config in strategy:
+            # Stop between OCR attempts if the job was cancelled
+            check_cancelled(cancel_event, f"Cancelled while processing {filename}")
+            if first_found is not None and hint_extra_attempts is not None \
+                    and details['hint_extra_attempts'] >= hint_extra_attempts:
+                logger.info(f"[{filename}] No date within the hint window after {hint_extra_attempts} extra attempts")
+                break
+            label = f"{img_name}-{config}"
+            try:
+                if img_name not in variants:
+                    variants[img_name] = PREPROCESS_VARIANTS[img_name](gray)
+                
+                details['attempts'] += 1
+                if first_found is not None:
+                    details['hint_extra_attempts'] += 1
+                text = pytesseract.image_to_string(variants[img_name], config=config)
+                all_text += " " + text
+                
+                logger.info(f"[{filename}] OCR ({label}): {text[:100].strip()}...")
+                
+                found_dates = find_dates_in_text(text, f"{filename}-{label}")
+                if found_dates:
+                    best, agreed = pick(found_dates)
+                    result = chosen(found_dates, best, agreed, text=text, variant=img_name, config=config)
+                    if hint_window is None or agreed:
+                        details.update(result)
+                        logger.info(f"[{filename}] 🎯 SUCCESS with {label} -> {details['date']}" + (" (agrees with hint)" if agreed else ""))
+                        return details
+                    if first_found is None:
+                        first_found, first_found_at = result, time.perf_counter()
                     
-                    date_result = extract_date_from_text(text, f"{filename}-{img_name}-{config_idx}")
-                    if date_result != "Unknown Date":
-                        logger.info(f"[{filename}] 🎯 SUCCESS with {img_name}-config{config_idx}")
-                        return date_result
-                        
-                except Exception as e:
-                    logger.warning(f"[{filename}] OCR failed for {img_name}-config{config_idx}: {e}")
-                    continue
+            except Exception as e:
+                logger.warning(f"[{filename}] OCR failed for {label}: {e}")
+                continue
         
         # Final attempt with all combined text
         logger.info(f"[{filename}] Trying combined text analysis (last resort)...")
-        final_result = extract_date_from_text(all_text, f"{filename}-combined")
-        return final_result
+        details['text'] = all_text
+        found_dates = find_dates_in_text(all_text, f"{filename}-combined")
+        if found_dates:
+            best, agreed = pick(found_dates)
+            if agreed or first_found is None:
+                details.update(chosen(found_dates, best, agreed, variant="combined"))
+            else:
+                details.update(first_found)
+        else:
+            logger.warning(f"[{filename}-combined] ❌ No valid dates found")
+        return details
             
+    except JobCancelled:
+        raise
     except Exception as e:
         logger.error(f"Error extracting date from {image_path}: {e}")
-        return "Unknown Date"
+        return details
+    finally:
+        details['ocr_seconds'] = round(time.perf_counter() - start, 3)
+        if first_found_at is not None:
+            details['hint_extra_seconds'] = round(time.perf_counter() - first_found_at, 3)
+
+def extract_date_from_image(image_path, cancel_event=None, strategy=None):
+    """Extract date from receipt image using OCR; see extract_date_details()."""
+    return extract_date_details(image_path, cancel_event=cancel_event, strategy=strategy)['date']
 
 def set_table_borders(table):
     """Remove table borders for cleaner look."""
@@ -361,8 +534,18 @@ def set_table_borders(table):
     
     tbl.tblPr.append(tblBorders)
 
-def create_receipt_document(receipts_by_date):
-    """Create Word document with sorted receipts."""
+def create_receipt_document(receipts_by_date, cancel_event=None, temp_folder=None, tier=None):
+    """
+    Create Word document with sorted receipts.
+    Processed thumbnails go to temp_folder (default CONFIG['TEMP_FOLDER']);
+    give each job its own folder so concurrent jobs don't collide.
+    `tier` picks the thumbnail size tier (see OUTPUT_TIERS). python-docx
+    stores byte-identical pictures as a single media part, so duplicate
+    receipts only cost their table cell. Date groups are laid out in
+    chronological order (see group_sort_key).
+    """
+    if temp_folder:
+        os.makedirs(temp_folder, exist_ok=True)
     doc = Document()
     
     sections = doc.sections
@@ -374,7 +557,7 @@ def create_receipt_document(receipts_by_date):
     
     first_page = True
     
-    for date_str, file_paths in sorted(receipts_by_date.items()):
+    for date_str, file_paths in sorted(receipts_by_date.items(), key=lambda item: group_sort_key(item[0])):
         logger.info(f"Processing date group: {date_str} ({len(file_paths)} receipts)")
         
         if not first_page:
@@ -393,12 +576,13 @@ def create_receipt_document(receipts_by_date):
             table.allow_autofit = False
             
             for idx, img_path in enumerate(group):
+                check_cancelled(cancel_event, "Cancelled while creating document")
                 row_idx = idx // 2
                 col_idx = idx % 2
                 cell = table.cell(row_idx, col_idx)
                 
                 try:
-                    processed_img_path = process_image(img_path)
+                    processed_img_path = process_image(img_path, temp_folder=temp_folder, tier=tier)
                     cell.text = ''
                     paragraph = cell.paragraphs[0]
                     run = paragraph.add_run()
@@ -530,107 +714,6 @@ def process_receipts(image_paths, output_doc=None):
     return os.path.abspath(output_doc)
 
 
-#new code SSE
-import shutil
-
-def process_receipts_with_sse(image_paths, output_doc, job_id, send_progress, job_tmp_dir):
-    """
-    Process receipts with real-time SSE progress updates.
-    This wraps the existing functions with progress reporting.
-    
-    Args:
-        image_paths: List of image file paths
-        output_doc: Path to save the output document
-        job_id: Unique job identifier
-        send_progress: Callback function to send progress updates
-        job_tmp_dir: Temporary directory to cleanup
-    """
-    try:
-        # Send initial status
-        send_progress(job_id, f"🚀 Starting receipt processing for {len(image_paths)} files...")
-        
-        # Ensure temp folder exists
-        create_temp_folder()
-        
-        receipts_by_date = {}
-        
-        # Process each image
-        for idx, img_path in enumerate(image_paths, 1):
-            filename = os.path.basename(img_path)
-            
-            try:
-                # Send processing update
-                percentage = int((idx / len(image_paths)) * 100)
-                send_progress(job_id, f"⏳ [{percentage}%] Processing {filename}...")
-                
-                logger.info(f"[Job {job_id}] Processing: {filename}")
-                
-                # Extract date from image (uses existing function)
-                date_str = extract_date_from_image(img_path)
-                
-                # Organize by date
-                if date_str not in receipts_by_date:
-                    receipts_by_date[date_str] = []
-                receipts_by_date[date_str].append(img_path)
-                
-                # Send success update
-                send_progress(job_id, f"✅ {filename} → {date_str}")
-                
-                logger.info(f"[Job {job_id}] Assigned '{date_str}' to {filename}")
-                
-            except Exception as e:
-                logger.error(f"[Job {job_id}] Error processing {img_path}: {e}")
-                
-                # Add to unknown date
-                receipts_by_date.setdefault("Unknown Date", []).append(img_path)
-                
-                # Send error update
-                send_progress(job_id, f"❌ Error processing {filename}: {str(e)}")
-        
-        # Send document generation status
-        send_progress(job_id, f"📄 Creating Word document with {len(receipts_by_date)} date groups...")
-        
-        # Create document (uses existing function)
-        logger.info(f"[Job {job_id}] Creating Word document...")
-        doc = create_receipt_document(receipts_by_date)
-        
-        # Save document
-        doc.save(output_doc)
-        logger.info(f"[Job {job_id}] Saved Word doc to: {output_doc}")
-        
-        # Send summary
-        summary_lines = [f"  • {date}: {len(files)} receipt(s)" for date, files in sorted(receipts_by_date.items())]
-        send_progress(job_id, f"📊 Summary:\n" + "\n".join(summary_lines))
-        
-        # Cleanup temp files
-        cleanup_temp_files()
-        
-        # Cleanup job temp directory
-        try:
-            shutil.rmtree(job_tmp_dir, ignore_errors=True)
-        except Exception as e:
-            logger.warning(f"[Job {job_id}] Could not cleanup temp dir: {e}")
-        
-        # Send completion with download info
-        download_filename = os.path.basename(output_doc)
-        send_progress(job_id, f"✅ Word document saved as '{download_filename}'")
-        send_progress(job_id, f"🎉 Processing complete! Ready for download.")
-        
-        logger.info(f"[Job {job_id}] ✅ Processing completed successfully")
-        
-    except Exception as e:
-        logger.error(f"[Job {job_id}] Fatal error: {e}")
-        
-        # Send error
-        send_progress(job_id, f"❌ Processing failed: {str(e)}")
-        
-        # Cleanup on error
-        try:
-            shutil.rmtree(job_tmp_dir, ignore_errors=True)
-        except:
-            pass
-
-
 # Keep your existing process_receipts function for backward compatibility
 def process_receipts(image_paths, output_doc=None):
     """
@@ -0,0 +1,165 @@
+# backend/utils/retention.py
+import os
+import time
+import shutil
+import threading
+import logging
+
+from utils.job_store import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Generated documents and job temp dirs older than this are deleted
+OUTPUT_TTL_SECONDS = float(os.environ.get("OUTPUT_TTL_SECONDS", str(7 * 24 * 3600)))
+TEMP_TTL_SECONDS = float(os.environ.get("TEMP_TTL_SECONDS", str(24 * 3600)))
+
+# Combined size cap for OUTPUT_DIR + TEMP_DIR; oldest entries go first
+RETENTION_QUOTA_BYTES = int(os.environ.get("RETENTION_QUOTA_BYTES", str(5 * 1024 ** 3)))
+
+SWEEP_INTERVAL_SECONDS = float(os.environ.get("RETENTION_SWEEP_INTERVAL_SECONDS", "600"))
+
+# Totals and the last sweep's figures are kept in the job store under
+# this name, so /retention answers the same on every API worker
+STATS_NAME = "retention"
+
+def _entry_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _job_id_for(name):
+    """Job id of an OUTPUT_DIR file (sorted_receipts_<id>.docx) or TEMP_DIR folder (<id>)."""
+    if name.startswith("sorted_receipts_") and name.endswith(".docx"):
+        return name[len("sorted_receipts_"):-len(".docx")]
+    return name
+
+def _list_entries(output_dir, temp_dir):
+    entries = []
+    for directory, ttl in ((output_dir, OUTPUT_TTL_SECONDS), (temp_dir, TEMP_TTL_SECONDS)):
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            entries.append({
+                "path": path,
+                "job_id": _job_id_for(name),
+                "mtime": mtime,
+                "ttl": ttl,
+                "size": _entry_size(path),
+            })
+    return entries
+
+def _delete(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def sweep(output_dir, temp_dir, is_active=lambda job_id: False, quota_bytes=None, stats_store=None):
+    """
+    Delete expired documents / job temp dirs, then the oldest remaining
+    ones while the total is over quota. Entries of jobs for which
+    is_active(job_id) is true are never touched. Returns the sweep's stats
+    and adds them to stats_store's totals, if given.
+    """
+    quota_bytes = RETENTION_QUOTA_BYTES if quota_bytes is None else quota_bytes
+    now = time.time()
+    entries = sorted(_list_entries(output_dir, temp_dir), key=lambda e: e["mtime"])
+    total = sum(e["size"] for e in entries)
+    deleted, reclaimed = 0, 0
+
+    for entry in entries:
+        expired = now - entry["mtime"] > entry["ttl"]
+        over_quota = total - reclaimed > quota_bytes
+        if not (expired or over_quota) or is_active(entry["job_id"]):
+            continue
+        _delete(entry["path"])
+        deleted += 1
+        reclaimed += entry["size"]
+        logger.info(f"Retention: removed {entry['path']} ({entry['size']} bytes, {'expired' if expired else 'over quota'})")
+
+    stats = {
+        "at": now,
+        "entries_deleted": deleted,
+        "bytes_reclaimed": reclaimed,
+        "bytes_remaining": total - reclaimed,
+    }
+    if stats_store is not None:
+        stats_store.add_stats(
+            STATS_NAME,
+            {"sweeps": 1, "entries_deleted": deleted, "bytes_reclaimed": reclaimed},
+            last_sweep=stats,
+        )
+    if deleted:
+        logger.info(f"🧹 Retention sweep reclaimed {reclaimed} bytes from {deleted} entries")
+    return stats
+
+def retention_report(job_store):
+    """Totals since the first sweep plus the last sweep's figures."""
+    report = {"sweeps": 0, "entries_deleted": 0, "bytes_reclaimed": 0, "last_sweep": None}
+    report.update(job_store.get_stats(STATS_NAME))
+    return report
+
+def _folder_job_id(temp_dir, folder):
+    """Job id owning a folder under temp_dir (TEMP_DIR/<id>/...), or None."""
+    relative = os.path.relpath(folder, temp_dir)
+    if relative.startswith(os.pardir):
+        return None
+    return relative.split(os.sep)[0]
+
+def start_retention_sweeper(output_dir, temp_dir, job_store, task_queue=None, interval=SWEEP_INTERVAL_SECONDS):
+    """
+    Run sweep() every `interval` seconds in a daemon thread. One sweeper
+    per deployment is enough: it runs in the OCR worker (worker.py, or the
+    API when it has embedded workers), never in every API process.
+    With task_queue, the jobs whose images an unfinished regroup reads
+    are kept as well.
+    """
+    def queue_active_jobs():
+        active = set()
+        if task_queue is None:
+            return active
+        for job_id in task_queue.unfinished_jobs():
+            active.add(job_id)
+            data = task_queue.get_job(job_id) or {}
+            # A regroup reads the uploads and thumbnails of the job it came from
+            for folder in (data.get("upload_dir"), data.get("thumb_dir")):
+                if folder:
+                    active.add(_folder_job_id(temp_dir, folder))
+        return active
+
+    def loop():
+        while True:
+            try:
+                active = queue_active_jobs()
+
+                def is_active(job_id):
+                    if job_id in active:
+                        return True
+                    # Documents and temp dirs of unfinished jobs are still in use
+                    job = job_store.get_job(job_id)
+                    return job is not None and job["status"] not in TERMINAL_STATUSES
+
+                sweep(output_dir, temp_dir, is_active, stats_store=job_store)
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="retention-sweeper")
+    thread.daemon = True
+    thread.start()
+    return thread
@@ -0,0 +1,21 @@
+# backend/utils/scheduler.py
+import os
+
+# Relative share of OCR workers a job gets, by priority class. The task
+# queue serves jobs by weighted fair queuing: each task claimed advances
+# the job's virtual time by 1 / weight and the job with the lowest virtual
+# time goes next, so a 3-receipt interactive upload gets a worker within
+# a few claims even while a 2,000-receipt backfill is queued.
+PRIORITY_WEIGHTS = {
+    "interactive": 4,
+    "normal": 2,
+    "bulk": 1,
+}
+
+# Jobs with at most this many receipts (PDF / TIFF pages counted singly)
+# default to the interactive class
+SMALL_JOB_FILES = int(os.environ.get("SMALL_JOB_FILES", "10"))
+
+def default_priority(total_files):
+    """Pick a priority class for a job that did not ask for one."""
+    return "interactive" if total_files <= SMALL_JOB_FILES else "bulk"
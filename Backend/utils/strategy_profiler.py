@@ -0,0 +1,218 @@
+# backend/utils/strategy_profiler.py
+"""
+Offline profiler for the preprocessing × OCR-config grid.
+
+Runs every (variant, config) cell of the grid over a folder of labelled
+receipts, records time / success / correctness per cell, prints a ranked
+cost-yield table and writes a pruned strategy the pipeline can load with
+OCR_STRATEGY_FILE:
+
+    python -m utils.strategy_profiler receipts/ --labels receipts/labels.csv --output ocr_strategy.json
+
+labels.csv has two columns, filename and date (YYYY-MM-DD); the date may
+be left empty for receipts that have no readable date.
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import logging
+from datetime import datetime
+
+import pytesseract
+
+from utils.receipt_sorter import (
+    PREPROCESS_VARIANTS,
+    OCR_CONFIGS,
+    _load_grayscale,
+    extract_date_from_text,
+    full_strategy,
+    logger as sorter_logger,
+)
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def load_labels(path):
+    """filename -> expected date string in the pipeline's format ("March 14, 2025"), or None."""
+    labels = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().lower() == "filename":
+                continue
+            name, date = row[0].strip(), (row[1].strip() if len(row) > 1 else "")
+            labels[name] = datetime.strptime(date, "%Y-%m-%d").strftime("%B %d, %Y") if date else None
+    return labels
+
+def profile_image(image_path, strategy):
+    """
+    Run every cell on one image. Returns ({(variant, config): {"seconds", "date"}},
+    {variant: seconds}): cell times are OCR only, preprocessing is timed
+    once per variant so the scoring below can charge it to whichever cell
+    uses the variant first in the order being evaluated, as the pipeline does.
+    """
+    gray = _load_grayscale(image_path)
+    variants = {}
+    preprocess = {}
+    cells = {}
+    for variant, config in strategy:
+        if variant not in variants:
+            start = time.perf_counter()
+            variants[variant] = PREPROCESS_VARIANTS[variant](gray)
+            preprocess[variant] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            text = pytesseract.image_to_string(variants[variant], config=config)
+            date = extract_date_from_text(text)
+        except Exception as e:
+            logger.warning(f"{os.path.basename(image_path)} {variant} {config}: {e}")
+            date = "Unknown Date"
+        cells[(variant, config)] = {"seconds": time.perf_counter() - start, "date": date}
+    return cells, preprocess
+
+def summarize(results, labels, strategy, preprocess):
+    """
+    Per-cell totals over all images: time, success (any date) and
+    correctness. Each cell is scored as if run on its own, so its time
+    includes preprocessing its variant.
+    """
+    table = []
+    for cell in strategy:
+        runs = [(name, cells[cell]) for name, cells in results.items()]
+        successes = [(name, run) for name, run in runs if run["date"] != "Unknown Date"]
+        correct = sum(1 for name, run in successes if run["date"] == labels.get(name))
+        seconds = sum(run["seconds"] + preprocess[name][cell[0]] for name, run in runs)
+        table.append({
+            "variant": cell[0],
+            "config": cell[1],
+            "images": len(runs),
+            "seconds": seconds,
+            "avg_ms": 1000 * seconds / max(len(runs), 1),
+            "success": len(successes),
+            "correct": correct,
+            "wrong": len(successes) - correct,
+            "correct_per_second": correct / seconds if seconds else 0.0,
+        })
+    table.sort(key=lambda row: (-row["correct_per_second"], row["wrong"]))
+    return table
+
+def prune_strategy(results, labels, strategy, preprocess):
+    """
+    Greedily build an ordered strategy. The pipeline stops at the first
+    cell that finds any date, so each step appends the cell with the best
+    (newly correct − newly wrong) per second spent on the images that are
+    still unresolved, until no cell improves the outcome. A cell whose
+    variant no chosen cell uses yet also pays for preprocessing it.
+    """
+    unresolved = set(results)
+    chosen = []
+    remaining = list(strategy)
+    while unresolved and remaining:
+        best, best_score = None, 0.0
+        for cell in remaining:
+            gain, cost = 0, 0.0
+            new_variant = all(variant != cell[0] for variant, _ in chosen)
+            for name in unresolved:
+                run = results[name][cell]
+                cost += run["seconds"] + (preprocess[name][cell[0]] if new_variant else 0.0)
+                if run["date"] != "Unknown Date":
+                    gain += 1 if run["date"] == labels.get(name) else -1
+            score = gain / cost if cost else 0.0
+            if score > best_score:
+                best, best_score = cell, score
+        if best is None:
+            break
+        chosen.append(best)
+        remaining.remove(best)
+        unresolved = {name for name in unresolved if results[name][best]["date"] == "Unknown Date"}
+    return chosen
+
+def simulate(results, labels, strategy, preprocess):
+    """Outcome of running `strategy` in pipeline order: (correct, wrong, seconds)."""
+    correct = wrong = 0
+    seconds = 0.0
+    for name, cells in results.items():
+        prepared = set()
+        for cell in strategy:
+            run = cells[cell]
+            if cell[0] not in prepared:
+                prepared.add(cell[0])
+                seconds += preprocess[name][cell[0]]
+            seconds += run["seconds"]
+            if run["date"] != "Unknown Date":
+                if run["date"] == labels.get(name):
+                    correct += 1
+                else:
+                    wrong += 1
+                break
+    return correct, wrong, seconds
+
+def print_table(table, chosen):
+    picks = {cell: i + 1 for i, cell in enumerate(chosen)}
+    print(f"{'rank':>4}  {'variant':<20}{'config':<18}{'success':>8}{'correct':>8}{'wrong':>6}{'avg ms':>9}{'correct/s':>10}{'pick':>6}")
+    for rank, row in enumerate(table, 1):
+        pick = picks.get((row["variant"], row["config"]), "")
+        print(
+            f"{rank:>4}  {row['variant']:<20}{row['config']:<18}"
+            f"{row['success']:>8}{row['correct']:>8}{row['wrong']:>6}"
+            f"{row['avg_ms']:>9.0f}{row['correct_per_second']:>10.2f}{pick:>6}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the preprocessing × OCR-config grid on labelled receipts")
+    parser.add_argument("folder", help="folder of receipt images")
+    parser.add_argument("--labels", help="CSV of filename,date (default: <folder>/labels.csv)")
+    parser.add_argument("--output", default="ocr_strategy.json", help="where to write the pruned strategy")
+    parser.add_argument("--report", help="optional JSON file for the raw per-cell table")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # The sorter logs every OCR attempt; keep the profiler's output readable
+    sorter_logger.setLevel(logging.ERROR)
+
+    labels = load_labels(args.labels or os.path.join(args.folder, "labels.csv"))
+    images = sorted(
+        name for name in os.listdir(args.folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS) and name in labels
+    )
+    if not images:
+        parser.error("no labelled receipt images found")
+
+    strategy = full_strategy()
+    logger.info(f"Profiling {len(images)} receipts × {len(strategy)} cells ({len(PREPROCESS_VARIANTS)} variants × {len(OCR_CONFIGS)} configs)")
+    results = {}
+    preprocess = {}
+    for i, name in enumerate(images, 1):
+        results[name], preprocess[name] = profile_image(os.path.join(args.folder, name), strategy)
+        logger.info(f"[{i}/{len(images)}] {name}")
+
+    table = summarize(results, labels, strategy, preprocess)
+    chosen = prune_strategy(results, labels, strategy, preprocess)
+    if not chosen:
+        logger.warning("No cell improved on finding nothing; keeping the full grid")
+        chosen = strategy
+    print_table(table, chosen)
+
+    full = simulate(results, labels, strategy, preprocess)
+    pruned = simulate(results, labels, chosen, preprocess)
+    print()
+    print(f"full grid   ({len(strategy):>2} cells): {full[0]} correct, {full[1]} wrong, {full[2]:.1f}s")
+    print(f"pruned list ({len(chosen):>2} cells): {pruned[0]} correct, {pruned[1]} wrong, {pruned[2]:.1f}s")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "strategy": [list(cell) for cell in chosen],
+            "images": len(images),
+            "full_grid": {"correct": full[0], "wrong": full[1], "seconds": round(full[2], 3)},
+            "pruned": {"correct": pruned[0], "wrong": pruned[1], "seconds": round(pruned[2], 3)},
+        }, f, indent=2)
+    print(f"Pruned strategy written to {args.output} (load it with OCR_STRATEGY_FILE={args.output})")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(table, f, indent=2)
+
+if __name__ == "__main__":
+    main()
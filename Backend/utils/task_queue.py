@@ -0,0 +1,788 @@
+# backend/utils/task_queue.py
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+from utils.scheduler import PRIORITY_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+# Task statuses that will not change any more
+FINISHED_TASK_STATUSES = ("done", "failed", "cancelled")
+
+class TaskQueue:
+    """
+    Durable per-image OCR task queue shared by the API and every worker.
+
+    A job's tasks are enqueued as its files arrive and the job is sealed
+    once the last one is in. Workers claim a task with a lease (visibility
+    timeout): if the worker dies the lease runs out and another worker
+    picks the task up again, up to max_attempts times. Jobs share workers
+    by weighted fair queuing: the job with the lowest virtual time is
+    served next and each claim advances it by 1 / priority weight.
+    """
+
+    def __init__(self, max_attempts=3):
+        self.max_attempts = max_attempts
+
+    # --- producer side (API) ---
+
+    def create_job(self, job_id, priority="normal", **data):
+        """Register a job. `data` (output path, temp dir, ...) is handed to the finalizer."""
+        raise NotImplementedError
+
+    def enqueue(self, job_id, image_path, **payload):
+        """Add one task to a job and return its position (1-based)."""
+        raise NotImplementedError
+
+    def enqueue_done(self, job_id, image_path, result, **payload):
+        """
+        Add a task that already has its result (e.g. a regrouped receipt
+        whose OCR ran in an earlier job). No worker claims it; it only
+        feeds the job's document. Returns its position (1-based).
+        """
+        raise NotImplementedError
+
+    def seal(self, job_id):
+        """Mark that no more tasks will be added to the job. Returns the task count."""
+        raise NotImplementedError
+
+    def cancel_job(self, job_id):
+        """Seal the job and cancel its unfinished tasks. Returns how many were cancelled."""
+        raise NotImplementedError
+
+    # --- consumer side (workers) ---
+
+    def claim(self, worker_id, lease_seconds):
+        """Lease the next task by fair share, or return None when there is nothing to do."""
+        raise NotImplementedError
+
+    def extend_lease(self, task_id, worker_id, lease_seconds):
+        """Heartbeat: keep a long-running task from being handed to another worker."""
+        raise NotImplementedError
+
+    def complete(self, task_id, worker_id, result):
+        """Store a task's result. Returns False if the lease was lost or the job cancelled."""
+        raise NotImplementedError
+
+    def fail(self, task_id, worker_id, error, retry_delay=5.0):
+        """Record a failed attempt; the task is retried after retry_delay until it runs out of attempts."""
+        raise NotImplementedError
+
+    def cancel_task(self, task_id):
+        """Mark one task cancelled (its job is being cancelled)."""
+        raise NotImplementedError
+
+    def reap_expired(self, finalize_lease_seconds=None):
+        """
+        Fail tasks whose last attempt's lease ran out (the worker died), and
+        release finalization claims not renewed for finalize_lease_seconds
+        so another worker builds the document. Returns affected job ids.
+        """
+        raise NotImplementedError
+
+    def finalizable_jobs(self):
+        """Sealed jobs whose tasks have all finished but whose document nobody has claimed yet."""
+        raise NotImplementedError
+
+    def claim_finalize(self, job_id, worker_id=None):
+        """
+        Atomically claim the job's finalization (building the document) once
+        it is sealed and every task has finished. Exactly one caller wins;
+        the claim is a lease the finalizer renews with extend_finalize().
+        """
+        raise NotImplementedError
+
+    def extend_finalize(self, job_id, worker_id=None):
+        """Heartbeat for a finalization claim."""
+        raise NotImplementedError
+
+    def finish_finalize(self, job_id):
+        """Mark the job's finalization as done, whatever its outcome."""
+        raise NotImplementedError
+
+    # --- inspection ---
+
+    def get_job(self, job_id):
+        """Return the job's data plus task counts by status, or None."""
+        raise NotImplementedError
+
+    def unfinished_jobs(self):
+        """Ids of jobs whose document has not been built (or released) yet."""
+        raise NotImplementedError
+
+    def get_progress(self, job_ids):
+        """Task counts of many jobs at once: {job_id: {"total_tasks", "enqueued", "finished", "counts"}}."""
+        raise NotImplementedError
+
+    def get_tasks(self, job_id, offset=0, limit=None):
+        """A job's tasks in upload order (all, or one page), with decoded payloads and results."""
+        raise NotImplementedError
+
+class SQLiteTaskQueue(TaskQueue):
+    """Task queue in a local SQLite file; works across processes on one machine."""
+
+    def __init__(self, path, max_attempts=3):
+        super().__init__(max_attempts)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS queue_jobs (
+                job_id TEXT PRIMARY KEY,
+                weight REAL NOT NULL,
+                vtime REAL NOT NULL,
+                total_tasks INTEGER,
+                finalize_state TEXT NOT NULL DEFAULT 'pending',
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                image_path TEXT NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                visible_at REAL NOT NULL,
+                worker_id TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (job_id, seq)
+            )
+        """)
+        # Finalization lease columns, added to queues created before they existed
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(queue_jobs)")}
+        if "finalize_worker" not in columns:
+            conn.execute("ALTER TABLE queue_jobs ADD COLUMN finalize_worker TEXT")
+            conn.execute("ALTER TABLE queue_jobs ADD COLUMN finalize_claimed_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS queue_jobs_finalize ON queue_jobs (finalize_state)")
+        conn.execute("CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, visible_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id, status)")
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    # --- producer side (API) ---
+
+    def create_job(self, job_id, priority="normal", **data):
+        now = time.time()
+        weight = PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS["normal"])
+        with self._transaction() as conn:
+            # Start at the current virtual time so a new job neither jumps
+            # ahead of nor lags behind jobs that are already running
+            (vtime,) = conn.execute("""
+                SELECT COALESCE(MIN(vtime), 0) FROM queue_jobs j
+                WHERE EXISTS (SELECT 1 FROM tasks t WHERE t.job_id = j.job_id AND t.status IN ('queued', 'running'))
+            """).fetchone()
+            conn.execute(
+                "INSERT INTO queue_jobs (job_id, weight, vtime, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, weight, vtime, json.dumps(dict(data, priority=priority)), now),
+            )
+
+    def enqueue(self, job_id, image_path, **payload):
+        now = time.time()
+        with self._transaction() as conn:
+            (seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM tasks WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            conn.execute(
+                """INSERT INTO tasks (job_id, seq, image_path, payload, visible_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, seq, image_path, json.dumps(payload), now, now, now),
+            )
+        return seq
+
+    def enqueue_done(self, job_id, image_path, result, **payload):
+        now = time.time()
+        with self._transaction() as conn:
+            (seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM tasks WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            conn.execute(
+                """INSERT INTO tasks (job_id, seq, image_path, payload, status, result, visible_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, 'done', ?, ?, ?, ?)""",
+                (job_id, seq, image_path, json.dumps(payload), json.dumps(result), now, now, now),
+            )
+        return seq
+
+    def seal(self, job_id):
+        with self._transaction() as conn:
+            (total,) = conn.execute("SELECT COUNT(*) FROM tasks WHERE job_id = ?", (job_id,)).fetchone()
+            conn.execute(
+                "UPDATE queue_jobs SET total_tasks = COALESCE(total_tasks, ?) WHERE job_id = ?",
+                (total, job_id),
+            )
+        return total
+
+    def cancel_job(self, job_id):
+        self.seal(job_id)
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE tasks SET status = 'cancelled', updated_at = ? WHERE job_id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            )
+        return cur.rowcount
+
+    # --- consumer side (workers) ---
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT j.job_id, j.weight FROM queue_jobs j
+                WHERE EXISTS (
+                    SELECT 1 FROM tasks t
+                    WHERE t.job_id = j.job_id AND t.status IN ('queued', 'running')
+                      AND t.visible_at <= ? AND t.attempts < ?
+                )
+                ORDER BY j.vtime, j.created_at LIMIT 1
+            """, (now, self.max_attempts)).fetchone()
+            if row is None:
+                return None
+            task = conn.execute("""
+                SELECT * FROM tasks
+                WHERE job_id = ? AND status IN ('queued', 'running') AND visible_at <= ? AND attempts < ?
+                ORDER BY seq LIMIT 1
+            """, (row["job_id"], now, self.max_attempts)).fetchone()
+            conn.execute(
+                """UPDATE tasks SET status = 'running', attempts = attempts + 1, worker_id = ?,
+                   visible_at = ?, updated_at = ? WHERE task_id = ?""",
+                (worker_id, now + lease_seconds, now, task["task_id"]),
+            )
+            conn.execute(
+                "UPDATE queue_jobs SET vtime = vtime + 1.0 / weight WHERE job_id = ?", (row["job_id"],)
+            )
+        task = dict(task)
+        task["attempts"] += 1
+        task["payload"] = json.loads(task["payload"])
+        return task
+
+    def extend_lease(self, task_id, worker_id, lease_seconds):
+        self._conn().execute(
+            "UPDATE tasks SET visible_at = ? WHERE task_id = ? AND worker_id = ? AND status = 'running'",
+            (time.time() + lease_seconds, task_id, worker_id),
+        )
+
+    def complete(self, task_id, worker_id, result):
+        cur = self._conn().execute(
+            """UPDATE tasks SET status = 'done', result = ?, error = NULL, updated_at = ?
+               WHERE task_id = ? AND worker_id = ? AND status = 'running'""",
+            (json.dumps(result), time.time(), task_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, task_id, worker_id, error, retry_delay=5.0):
+        now = time.time()
+        with self._transaction() as conn:
+            task = conn.execute(
+                "SELECT attempts FROM tasks WHERE task_id = ? AND worker_id = ? AND status = 'running'",
+                (task_id, worker_id),
+            ).fetchone()
+            if task is None:
+                return None
+            status = "queued" if task["attempts"] < self.max_attempts else "failed"
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, visible_at = ?, updated_at = ? WHERE task_id = ?",
+                (status, str(error), now + retry_delay, now, task_id),
+            )
+        return status
+
+    def cancel_task(self, task_id):
+        self._conn().execute(
+            "UPDATE tasks SET status = 'cancelled', updated_at = ? WHERE task_id = ?",
+            (time.time(), task_id),
+        )
+
+    def reap_expired(self, finalize_lease_seconds=None):
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT job_id FROM tasks WHERE status = 'running' AND visible_at <= ? AND attempts >= ?",
+                (now, self.max_attempts),
+            ).fetchall()
+            conn.execute(
+                """UPDATE tasks SET status = 'failed', error = 'Worker lease expired', updated_at = ?
+                   WHERE status = 'running' AND visible_at <= ? AND attempts >= ?""",
+                (now, now, self.max_attempts),
+            )
+            stale = []
+            if finalize_lease_seconds is not None:
+                stale = conn.execute(
+                    "SELECT job_id FROM queue_jobs WHERE finalize_state = 'claimed' AND finalize_claimed_at <= ?",
+                    (now - finalize_lease_seconds,),
+                ).fetchall()
+                conn.execute(
+                    """UPDATE queue_jobs SET finalize_state = 'pending', finalize_worker = NULL, finalize_claimed_at = NULL
+                       WHERE finalize_state = 'claimed' AND finalize_claimed_at <= ?""",
+                    (now - finalize_lease_seconds,),
+                )
+        for row in stale:
+            logger.warning(f"[Job {row['job_id']}] Finalization lease expired, releasing it")
+        return list(dict.fromkeys(row["job_id"] for row in rows + stale))
+
+    def finalizable_jobs(self):
+        rows = self._conn().execute("""
+            SELECT job_id FROM queue_jobs j
+            WHERE finalize_state = 'pending' AND total_tasks IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM tasks t
+                  WHERE t.job_id = j.job_id AND t.status NOT IN ('done', 'failed', 'cancelled')
+              )
+            ORDER BY created_at
+        """).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def claim_finalize(self, job_id, worker_id=None):
+        now = time.time()
+        with self._transaction() as conn:
+            job = conn.execute(
+                "SELECT total_tasks, finalize_state FROM queue_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if job is None or job["total_tasks"] is None or job["finalize_state"] != "pending":
+                return False
+            (unfinished,) = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status NOT IN ('done', 'failed', 'cancelled')",
+                (job_id,),
+            ).fetchone()
+            if unfinished:
+                return False
+            conn.execute(
+                """UPDATE queue_jobs SET finalize_state = 'claimed', finalize_worker = ?, finalize_claimed_at = ?
+                   WHERE job_id = ?""",
+                (worker_id, now, job_id),
+            )
+        return True
+
+    def extend_finalize(self, job_id, worker_id=None):
+        self._conn().execute(
+            """UPDATE queue_jobs SET finalize_claimed_at = ?
+               WHERE job_id = ? AND finalize_state = 'claimed' AND finalize_worker IS ?""",
+            (time.time(), job_id, worker_id),
+        )
+
+    def finish_finalize(self, job_id):
+        self._conn().execute(
+            "UPDATE queue_jobs SET finalize_state = 'done' WHERE job_id = ?", (job_id,)
+        )
+
+    # --- inspection ---
+
+    def get_job(self, job_id):
+        conn = self._conn()
+        job = conn.execute("SELECT * FROM queue_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+        data = json.loads(job["data"])
+        data.update(
+            total_tasks=job["total_tasks"],
+            enqueued=sum(counts.values()),
+            finished=sum(counts.get(s, 0) for s in FINISHED_TASK_STATUSES),
+            counts=counts,
+        )
+        return data
+
+    def unfinished_jobs(self):
+        rows = self._conn().execute(
+            "SELECT job_id FROM queue_jobs WHERE finalize_state != 'done' ORDER BY created_at"
+        ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def get_progress(self, job_ids):
+        progress = {}
+        conn = self._conn()
+        job_ids = list(job_ids)
+        # Stay under SQLite's host-parameter limit
+        for i in range(0, len(job_ids), 500):
+            chunk = job_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT job_id, total_tasks FROM queue_jobs WHERE job_id IN ({marks})", chunk
+            ):
+                progress[row["job_id"]] = {"total_tasks": row["total_tasks"], "enqueued": 0, "finished": 0, "counts": {}}
+            for row in conn.execute(
+                f"SELECT job_id, status, COUNT(*) AS n FROM tasks WHERE job_id IN ({marks}) GROUP BY job_id, status", chunk
+            ):
+                entry = progress.get(row["job_id"])
+                if entry is None:
+                    continue
+                entry["counts"][row["status"]] = row["n"]
+                entry["enqueued"] += row["n"]
+                if row["status"] in FINISHED_TASK_STATUSES:
+                    entry["finished"] += row["n"]
+        return progress
+
+    def get_tasks(self, job_id, offset=0, limit=None):
+        rows = self._conn().execute(
+            "SELECT * FROM tasks WHERE job_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+            (job_id, -1 if limit is None else limit, offset),
+        ).fetchall()
+        tasks = []
+        for row in rows:
+            task = dict(row)
+            task["payload"] = json.loads(task["payload"])
+            task["result"] = json.loads(task["result"]) if task["result"] else None
+            tasks.append(task)
+        return tasks
+
+class RedisTaskQueue(TaskQueue):
+    """
+    Task queue on a Redis-compatible client, for API instances and workers
+    on several machines. Changes to the queue run under one Redis lock
+    (client.lock), so claims, completions and finalize claims are as atomic
+    as the SQLite queue's transactions; reads don't take it. LocalRedis
+    (utils.job_store) stands in for a real Redis in a single process.
+
+    Keys, under `prefix`:
+      queue:vtime              jobs not yet finalized, scored by virtual time
+      queue:open               the same jobs, scored by creation time
+      queue:job:{id}           the job's fields (JSON values)
+      queue:job:{id}:tasks     seq -> task (JSON)
+      queue:job:{id}:counts    task status -> count
+      queue:job:{id}:ready     queued / running tasks, scored by when they
+                               may be claimed (running: when the lease ends)
+    A finalized job's keys expire after ttl_seconds.
+    """
+
+    def __init__(self, client, prefix="arcflow", max_attempts=3, ttl_seconds=None):
+        super().__init__(max_attempts)
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("JOB_TTL_SECONDS", "86400"))
+
+    def _key(self, *parts):
+        return ":".join((self.prefix, "queue") + parts)
+
+    def _job_keys(self, job_id):
+        return [self._key("job", job_id, *suffix) for suffix in ((), ("tasks",), ("counts",), ("ready",))]
+
+    def _lock(self):
+        return self.client.lock(self._key("lock"), timeout=30, blocking_timeout=60)
+
+    # Tasks are ready-set members by zero-padded seq, so ties sort in upload order
+
+    @staticmethod
+    def _member(seq):
+        return f"{seq:010d}"
+
+    @staticmethod
+    def _task_id(job_id, seq):
+        return f"{job_id}:{seq}"
+
+    def _meta(self, job_id):
+        raw = self.client.hgetall(self._key("job", job_id))
+        return {field: json.loads(value) for field, value in raw.items()} if raw else None
+
+    def _set_meta(self, job_id, **fields):
+        self.client.hset(self._key("job", job_id), mapping={field: json.dumps(value) for field, value in fields.items()})
+
+    def _get_task(self, job_id, seq):
+        raw = self.client.hget(self._key("job", job_id, "tasks"), str(seq))
+        return json.loads(raw) if raw else None
+
+    def _put_task(self, task):
+        self.client.hset(self._key("job", task["job_id"], "tasks"), mapping={str(task["seq"]): json.dumps(task)})
+
+    def _count(self, job_id, old_status, new_status):
+        key = self._key("job", job_id, "counts")
+        if old_status is not None and self.client.hincrby(key, old_status, -1) <= 0:
+            self.client.hdel(key, old_status)
+        if new_status is not None:
+            self.client.hincrby(key, new_status, 1)
+
+    def _counts(self, job_id):
+        return {status: int(n) for status, n in self.client.hgetall(self._key("job", job_id, "counts")).items() if int(n) > 0}
+
+    def _leased_task(self, task_id, worker_id):
+        job_id, _, seq = task_id.rpartition(":")
+        task = self._get_task(job_id, int(seq))
+        if task is None or task["worker_id"] != worker_id or task["status"] != "running":
+            return None
+        return task
+
+    def _add_task(self, job_id, image_path, payload, status="queued", result=None):
+        now = time.time()
+        seq = self.client.hincrby(self._key("job", job_id), "next_seq", 1)
+        self._put_task({
+            "task_id": self._task_id(job_id, seq), "job_id": job_id, "seq": seq,
+            "image_path": image_path, "payload": payload, "status": status, "attempts": 0,
+            "visible_at": now, "worker_id": None, "result": result, "error": None,
+            "created_at": now, "updated_at": now,
+        })
+        self._count(job_id, None, status)
+        if status == "queued":
+            self.client.zadd(self._key("job", job_id, "ready"), {self._member(seq): now})
+        return seq
+
+    def _seal(self, job_id):
+        total = len(self.client.hgetall(self._key("job", job_id, "tasks")))
+        meta = self._meta(job_id)
+        if meta is not None and meta.get("total_tasks") is None:
+            self._set_meta(job_id, total_tasks=total)
+        return total
+
+    # --- producer side (API) ---
+
+    def create_job(self, job_id, priority="normal", **data):
+        now = time.time()
+        weight = PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS["normal"])
+        with self._lock():
+            # Start at the current virtual time of jobs with work left, as
+            # the SQLite queue does
+            vtime = 0.0
+            for other, other_vtime in self.client.zrange(self._key("vtime"), 0, -1, withscores=True):
+                if self.client.zrange(self._key("job", other, "ready"), 0, 0):
+                    vtime = other_vtime
+                    break
+            self._set_meta(
+                job_id, weight=weight, created_at=now, total_tasks=None,
+                finalize_state="pending", finalize_worker=None, finalize_claimed_at=None,
+                data=dict(data, priority=priority),
+            )
+            self.client.hset(self._key("job", job_id), mapping={"next_seq": 0})
+            self.client.zadd(self._key("vtime"), {job_id: vtime})
+            self.client.zadd(self._key("open"), {job_id: now})
+
+    def enqueue(self, job_id, image_path, **payload):
+        with self._lock():
+            return self._add_task(job_id, image_path, payload)
+
+    def enqueue_done(self, job_id, image_path, result, **payload):
+        with self._lock():
+            return self._add_task(job_id, image_path, payload, status="done", result=result)
+
+    def seal(self, job_id):
+        with self._lock():
+            return self._seal(job_id)
+
+    def cancel_job(self, job_id):
+        now = time.time()
+        cancelled = 0
+        with self._lock():
+            self._seal(job_id)
+            for raw in self.client.hgetall(self._key("job", job_id, "tasks")).values():
+                task = json.loads(raw)
+                if task["status"] in ("queued", "running"):
+                    self._count(job_id, task["status"], "cancelled")
+                    self._put_task(dict(task, status="cancelled", updated_at=now))
+                    cancelled += 1
+            self.client.delete(self._key("job", job_id, "ready"))
+        return cancelled
+
+    # --- consumer side (workers) ---
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        with self._lock():
+            for job_id in self.client.zrange(self._key("vtime"), 0, -1):
+                ready_key = self._key("job", job_id, "ready")
+                for member in self.client.zrangebyscore(ready_key, "-inf", now, start=0, num=50):
+                    task = self._get_task(job_id, int(member))
+                    # Spent tasks wait for reap_expired()
+                    if task is None or task["status"] not in ("queued", "running") or task["attempts"] >= self.max_attempts:
+                        continue
+                    if task["status"] == "queued":
+                        self._count(job_id, "queued", "running")
+                    task.update(
+                        status="running", attempts=task["attempts"] + 1, worker_id=worker_id,
+                        visible_at=now + lease_seconds, updated_at=now,
+                    )
+                    self._put_task(task)
+                    self.client.zadd(ready_key, {member: task["visible_at"]})
+                    self.client.zincrby(self._key("vtime"), 1.0 / self._meta(job_id)["weight"], job_id)
+                    return task
+        return None
+
+    def extend_lease(self, task_id, worker_id, lease_seconds):
+        with self._lock():
+            task = self._leased_task(task_id, worker_id)
+            if task is not None:
+                task["visible_at"] = time.time() + lease_seconds
+                self._put_task(task)
+                self.client.zadd(self._key("job", task["job_id"], "ready"), {self._member(task["seq"]): task["visible_at"]})
+
+    def complete(self, task_id, worker_id, result):
+        with self._lock():
+            task = self._leased_task(task_id, worker_id)
+            if task is None:
+                return False
+            self._put_task(dict(task, status="done", result=result, error=None, updated_at=time.time()))
+            self.client.zrem(self._key("job", task["job_id"], "ready"), self._member(task["seq"]))
+            self._count(task["job_id"], "running", "done")
+        return True
+
+    def fail(self, task_id, worker_id, error, retry_delay=5.0):
+        now = time.time()
+        with self._lock():
+            task = self._leased_task(task_id, worker_id)
+            if task is None:
+                return None
+            status = "queued" if task["attempts"] < self.max_attempts else "failed"
+            self._put_task(dict(task, status=status, error=str(error), visible_at=now + retry_delay, updated_at=now))
+            ready_key = self._key("job", task["job_id"], "ready")
+            if status == "queued":
+                self.client.zadd(ready_key, {self._member(task["seq"]): now + retry_delay})
+            else:
+                self.client.zrem(ready_key, self._member(task["seq"]))
+            self._count(task["job_id"], "running", status)
+        return status
+
+    def cancel_task(self, task_id):
+        job_id, _, seq = task_id.rpartition(":")
+        with self._lock():
+            task = self._get_task(job_id, int(seq))
+            if task is None or task["status"] == "cancelled":
+                return
+            self._put_task(dict(task, status="cancelled", updated_at=time.time()))
+            self.client.zrem(self._key("job", job_id, "ready"), self._member(task["seq"]))
+            self._count(job_id, task["status"], "cancelled")
+
+    def reap_expired(self, finalize_lease_seconds=None):
+        now = time.time()
+        affected = []
+        with self._lock():
+            for job_id in self.client.zrange(self._key("open"), 0, -1):
+                ready_key = self._key("job", job_id, "ready")
+                for member in self.client.zrangebyscore(ready_key, "-inf", now):
+                    task = self._get_task(job_id, int(member))
+                    if task and task["status"] == "running" and task["attempts"] >= self.max_attempts:
+                        self._put_task(dict(task, status="failed", error="Worker lease expired", updated_at=now))
+                        self.client.zrem(ready_key, member)
+                        self._count(job_id, "running", "failed")
+                        affected.append(job_id)
+                if finalize_lease_seconds is None:
+                    continue
+                meta = self._meta(job_id)
+                if meta and meta["finalize_state"] == "claimed" and meta["finalize_claimed_at"] <= now - finalize_lease_seconds:
+                    self._set_meta(job_id, finalize_state="pending", finalize_worker=None, finalize_claimed_at=None)
+                    logger.warning(f"[Job {job_id}] Finalization lease expired, releasing it")
+                    affected.append(job_id)
+        return list(dict.fromkeys(affected))
+
+    def _finalizable(self, job_id):
+        meta = self._meta(job_id)
+        if meta is None or meta["total_tasks"] is None or meta["finalize_state"] != "pending":
+            return False
+        counts = self._counts(job_id)
+        return not any(counts.get(status) for status in ("queued", "running"))
+
+    def finalizable_jobs(self):
+        return [job_id for job_id in self.client.zrange(self._key("open"), 0, -1) if self._finalizable(job_id)]
+
+    def claim_finalize(self, job_id, worker_id=None):
+        with self._lock():
+            if not self._finalizable(job_id):
+                return False
+            self._set_meta(job_id, finalize_state="claimed", finalize_worker=worker_id, finalize_claimed_at=time.time())
+        return True
+
+    def extend_finalize(self, job_id, worker_id=None):
+        with self._lock():
+            meta = self._meta(job_id)
+            if meta and meta["finalize_state"] == "claimed" and meta["finalize_worker"] == worker_id:
+                self._set_meta(job_id, finalize_claimed_at=time.time())
+
+    def finish_finalize(self, job_id):
+        with self._lock():
+            if self._meta(job_id) is None:
+                return
+            self._set_meta(job_id, finalize_state="done")
+            self.client.zrem(self._key("vtime"), job_id)
+            self.client.zrem(self._key("open"), job_id)
+            for key in self._job_keys(job_id):
+                self.client.expire(key, self.ttl_seconds)
+
+    # --- inspection ---
+
+    def get_job(self, job_id):
+        meta = self._meta(job_id)
+        if meta is None:
+            return None
+        counts = self._counts(job_id)
+        data = dict(meta["data"])
+        data.update(
+            total_tasks=meta["total_tasks"],
+            enqueued=sum(counts.values()),
+            finished=sum(counts.get(s, 0) for s in FINISHED_TASK_STATUSES),
+            counts=counts,
+        )
+        return data
+
+    def unfinished_jobs(self):
+        return list(self.client.zrange(self._key("open"), 0, -1))
+
+    def get_progress(self, job_ids):
+        progress = {}
+        for job_id in job_ids:
+            job = self.get_job(job_id)
+            if job is not None:
+                progress[job_id] = {key: job[key] for key in ("total_tasks", "enqueued", "finished", "counts")}
+        return progress
+
+    def get_tasks(self, job_id, offset=0, limit=None):
+        tasks = sorted(
+            (json.loads(raw) for raw in self.client.hgetall(self._key("job", job_id, "tasks")).values()),
+            key=lambda task: task["seq"],
+        )
+        return tasks[offset:] if limit is None else tasks[offset:offset + limit]
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block, serialising writers across processes."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def create_task_queue(url=None):
+    """
+    Build the task queue named by TASK_QUEUE_URL:
+      sqlite:///path/to/tasks.db  (default: TASK_QUEUE_PATH, or tasks.db next to main.py)
+      redis://host:port/0         (needs the `redis` package; API and workers on several machines)
+      memory://                   (LocalRedis, single process only)
+    """
+    max_attempts = int(os.environ.get("TASK_MAX_ATTEMPTS", "3"))
+    url = url or os.environ.get("TASK_QUEUE_URL") or "sqlite:///" + (
+        os.environ.get("TASK_QUEUE_PATH") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "tasks.db")
+    )
+    if url.startswith("sqlite:///"):
+        return SQLiteTaskQueue(url[len("sqlite:///"):], max_attempts=max_attempts)
+    if url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TASK_QUEUE_URL is a redis:// URL but the `redis` package is not installed")
+        return RedisTaskQueue(redis.Redis.from_url(url, decode_responses=True), max_attempts=max_attempts)
+    if url.startswith("memory://"):
+        from utils.job_store import LocalRedis
+        return RedisTaskQueue(LocalRedis(), max_attempts=max_attempts)
+    raise ValueError(f"Unsupported TASK_QUEUE_URL: {url}")
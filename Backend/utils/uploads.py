@@ -0,0 +1,275 @@
+# backend/utils/uploads.py
+import os
+import re
+import zlib
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File types the OCR pipeline accepts (PDF and TIFF pages are split by utils.pages)
+RECEIPT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pdf', '.tif', '.tiff')
+
+# Limits for ZIP archive uploads
+ZIP_MAX_TOTAL_BYTES = int(os.environ.get("ZIP_MAX_TOTAL_BYTES", str(2 * 1024 ** 3)))   # uncompressed, whole archive
+ZIP_MAX_ENTRY_BYTES = int(os.environ.get("ZIP_MAX_ENTRY_BYTES", str(50 * 1024 ** 2)))  # uncompressed, per entry
+ZIP_MAX_ENTRIES = int(os.environ.get("ZIP_MAX_ENTRIES", "5000"))
+ZIP_MAX_RATIO = float(os.environ.get("ZIP_MAX_RATIO", "100"))  # uncompressed / compressed, per entry
+
+class UploadError(ValueError):
+    """The upload is malformed or breaks a limit; the message is safe to show the client."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def safe_relative_path(name):
+    """
+    Turn a client-supplied name ("2024/March/receipt.jpg", "..\\x.png")
+    into a relative path that stays inside the job directory.
+    """
+    parts = []
+    for part in re.split(r'[\\/]+', name):
+        part = part.strip()
+        if part in ('', '.', '..'):
+            continue
+        parts.append(re.sub(r'[\x00-\x1f:*?"<>|]', '_', part))
+    return os.path.join(*parts) if parts else "upload"
+
+def unique_upload_path(job_tmp_dir, name):
+    """
+    Destination for an uploaded file that keeps its folder structure and
+    never overwrites an earlier file of the same name.
+    """
+    path = os.path.join(job_tmp_dir, safe_relative_path(name))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    base, ext = os.path.splitext(path)
+    counter = 1
+    while os.path.exists(path):
+        path = f"{base}_{counter}{ext}"
+        counter += 1
+    return path
+
+def is_receipt_file(name):
+    """True for image files, skipping folders and OS metadata such as __MACOSX/ and ._ files."""
+    parts = re.split(r'[\\/]+', name)
+    if "__MACOSX" in parts or parts[-1].startswith('.'):
+        return False
+    return name.lower().endswith(RECEIPT_EXTENSIONS)
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_SIG = 0x04034b50
+_DESCRIPTOR_SIG = 0x08074b50
+_CENTRAL_SIGS = (0x02014b50, 0x06054b50, 0x06064b50)
+
+class ZipStreamExtractor:
+    """
+    Extracts a ZIP archive while it is still being uploaded, by walking the
+    local file headers in arrival order instead of seeking to the central
+    directory. Feed it chunks as they arrive; each call returns the paths
+    of the receipt images completed so far, ready for OCR.
+
+    Guards: total and per-entry uncompressed size, entry count and the
+    compression ratio of every entry (zip bombs). Encrypted, ZIP64 and
+    stored-with-data-descriptor entries are rejected.
+    """
+
+    def __init__(self, dest_dir, max_total_bytes=ZIP_MAX_TOTAL_BYTES, max_entry_bytes=ZIP_MAX_ENTRY_BYTES,
+                 max_entries=ZIP_MAX_ENTRIES, max_ratio=ZIP_MAX_RATIO):
+        self.dest_dir = dest_dir
+        self.max_total_bytes = max_total_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_entries = max_entries
+        self.max_ratio = max_ratio
+
+        self.entries = 0
+        self.total_bytes = 0
+        self.extracted = []
+        self._buf = b""
+        self._state = "header"
+        self._entry = None
+        self._done = False
+
+    def feed(self, chunk):
+        """Consume the next chunk of the upload; return newly extracted file paths."""
+        if self._done:
+            return []
+        self._buf += chunk
+        completed = []
+        while self._step(completed):
+            pass
+        return completed
+
+    def close(self):
+        """Call after the last chunk; raises if the archive was cut short."""
+        if not self._done and (self._state != "header" or self._buf):
+            self._abort_entry()
+            raise UploadError("ZIP archive is truncated")
+        return self.extracted
+
+    # --- state machine ---
+
+    def _step(self, completed):
+        if self._state == "header":
+            return self._read_header()
+        if self._state == "name":
+            return self._read_name()
+        if self._state == "data":
+            return self._read_data(completed)
+        if self._state == "descriptor":
+            return self._read_descriptor(completed)
+        return False
+
+    def _read_header(self):
+        if len(self._buf) < 4:
+            return False
+        (sig,) = struct.unpack_from("<I", self._buf)
+        if sig in _CENTRAL_SIGS:
+            # Central directory: every entry has been seen
+            self._done = True
+            self._buf = b""
+            return False
+        if sig != _LOCAL_SIG:
+            raise UploadError("Not a ZIP archive (bad local header)")
+        if len(self._buf) < _LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, crc, csize, usize, name_len, extra_len) = _LOCAL_HEADER.unpack_from(self._buf)
+        self._buf = self._buf[_LOCAL_HEADER.size:]
+
+        self.entries += 1
+        if self.entries > self.max_entries:
+            raise UploadError(f"ZIP archive has more than {self.max_entries} entries", 413)
+        if flags & 0x1:
+            raise UploadError("Encrypted ZIP entries are not supported")
+        if method not in (0, 8):
+            raise UploadError(f"Unsupported ZIP compression method {method}")
+        if 0xFFFFFFFF in (csize, usize):
+            raise UploadError("ZIP64 archives are not supported")
+        has_descriptor = bool(flags & 0x8)
+        if has_descriptor and method == 0:
+            raise UploadError("Stored ZIP entries with a data descriptor are not supported")
+
+        self._entry = {
+            "method": method,
+            "crc": crc,
+            "csize": None if has_descriptor else csize,
+            "usize": None if has_descriptor else usize,
+            "name_len": name_len,
+            "extra_len": extra_len,
+            "consumed": 0,
+            "written": 0,
+            "crc_calc": 0,
+            "inflater": zlib.decompressobj(-15) if method == 8 else None,
+            "file": None,
+            "path": None,
+        }
+        self._state = "name"
+        return True
+
+    def _read_name(self):
+        entry = self._entry
+        need = entry["name_len"] + entry["extra_len"]
+        if len(self._buf) < need:
+            return False
+        name = self._buf[:entry["name_len"]].decode("utf-8", errors="replace")
+        self._buf = self._buf[need:]
+        entry["name"] = name
+
+        # Only image entries are written; everything else is decompressed and dropped
+        if not name.endswith("/") and is_receipt_file(name):
+            entry["path"] = unique_upload_path(self.dest_dir, name)
+            entry["file"] = open(entry["path"], "wb")
+        self._state = "data"
+        return True
+
+    def _read_data(self, completed):
+        entry = self._entry
+        if entry["csize"] is not None:
+            take = min(len(self._buf), entry["csize"] - entry["consumed"])
+        else:
+            take = len(self._buf)
+        data, self._buf = self._buf[:take], self._buf[take:]
+
+        if entry["method"] == 0:
+            entry["consumed"] += len(data)
+            self._write(data)
+        else:
+            inflater = entry["inflater"]
+            while data:
+                out = inflater.decompress(data, 64 * 1024)
+                consumed = len(data) - len(inflater.unconsumed_tail)
+                entry["consumed"] += consumed
+                self._write(out)
+                data = inflater.unconsumed_tail
+                if inflater.eof:
+                    # Bytes past the end of the deflate stream belong to the next record
+                    self._buf = inflater.unused_data + data + self._buf
+                    entry["consumed"] -= len(inflater.unused_data)
+                    break
+                if not out and not data:
+                    break
+
+        finished = (
+            entry["consumed"] >= entry["csize"] if entry["csize"] is not None
+            else entry["inflater"].eof
+        )
+        if not finished:
+            return False
+        if entry["method"] == 8 and not entry["inflater"].eof:
+            raise UploadError(f"Corrupt ZIP entry '{entry['name']}'")
+        if entry["csize"] is None:
+            self._state = "descriptor"
+            return True
+        self._finish_entry(entry["crc"], completed)
+        return True
+
+    def _read_descriptor(self, completed):
+        if len(self._buf) < 16:
+            return False
+        (sig,) = struct.unpack_from("<I", self._buf)
+        offset = 4 if sig == _DESCRIPTOR_SIG else 0
+        crc, _, _ = struct.unpack_from("<III", self._buf, offset)
+        self._buf = self._buf[offset + 12:]
+        self._finish_entry(crc, completed)
+        return True
+
+    def _write(self, data):
+        if not data:
+            return
+        entry = self._entry
+        entry["written"] += len(data)
+        self.total_bytes += len(data)
+        entry["crc_calc"] = zlib.crc32(data, entry["crc_calc"])
+
+        if entry["written"] > self.max_entry_bytes:
+            self._abort_entry()
+            raise UploadError(f"ZIP entry '{entry['name']}' is larger than {self.max_entry_bytes} bytes", 413)
+        if self.total_bytes > self.max_total_bytes:
+            self._abort_entry()
+            raise UploadError(f"ZIP archive expands to more than {self.max_total_bytes} bytes", 413)
+        # Ratio check once there is enough output for it to mean something
+        if entry["written"] > 1024 * 1024 and entry["written"] > self.max_ratio * max(entry["consumed"], 1):
+            self._abort_entry()
+            raise UploadError(f"ZIP entry '{entry['name']}' has a suspicious compression ratio (zip bomb?)", 413)
+        if entry["file"] is not None:
+            entry["file"].write(data)
+
+    def _finish_entry(self, expected_crc, completed):
+        entry = self._entry
+        if entry["file"] is not None:
+            entry["file"].close()
+            if entry["crc_calc"] != expected_crc:
+                os.remove(entry["path"])
+                raise UploadError(f"CRC mismatch in ZIP entry '{entry['name']}'")
+            self.extracted.append(entry["path"])
+            completed.append(entry["path"])
+            logger.info(f"Extracted {entry['name']} ({entry['written']} bytes)")
+        self._entry = None
+        self._state = "header"
+
+    def _abort_entry(self):
+        entry = self._entry
+        if entry and entry["file"] is not None:
+            entry["file"].close()
+            os.remove(entry["path"])
+            entry["file"] = None
@@ -0,0 +1,62 @@
+# backend/worker.py
+"""
+Standalone OCR worker. Claims per-image tasks from the durable task queue,
+runs OCR, writes results back and builds each job's document once all its
+tasks have finished. Start as many of these as the OCR load needs: on
+the API's host with the default SQLite task queue, or on any machine that
+shares the API's Redis (JOB_STORE_URL, TASK_QUEUE_URL) and its upload and
+output directories:
+
+    python worker.py --threads 2
+
+Each deployment needs exactly one output / temp retention sweeper. The
+first worker runs it; start any further ones with --no-retention.
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from utils.job_store import create_job_store
+from utils.ocr_store import create_ocr_store
+from utils.retention import start_retention_sweeper
+from utils.task_queue import create_task_queue
+from utils.warmup import warm_up
+
+logger = logging.getLogger(__name__)
+
+# Same locations the API uses (main.py)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMP_DIR = os.path.join(BASE_DIR, "temp_uploads")
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+def main():
+    parser = argparse.ArgumentParser(description="ARCFLOW OCR worker")
+    parser.add_argument("--threads", type=int, default=1, help="worker threads in this process")
+    parser.add_argument("--no-retention", action="store_true", help="don't run the retention sweeper here")
+    args = parser.parse_args()
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    # Import the pipeline and prime Tesseract before claiming the first task
+    warm_up()
+    from utils.ocr_worker import start_worker_threads
+
+    queue = create_task_queue()
+    job_store = create_job_store()
+    ocr_store = create_ocr_store()
+    threads = start_worker_threads(queue, job_store, args.threads, stop_event=stop_event, ocr_store=ocr_store)
+    if not args.no_retention:
+        start_retention_sweeper(OUTPUT_DIR, TEMP_DIR, job_store, queue)
+
+    # Tasks in flight when we stop are picked up again once their lease expires
+    stop_event.wait()
+    logger.info("Stopping OCR worker...")
+    for thread in threads:
+        thread.join()
+
+if __name__ == "__main__":
+    main()